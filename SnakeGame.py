@@ -6,22 +6,34 @@ Machine Learning Classes - University Carlos III of Madrid
 """
 from snake_env import SnakeGameEnv
 from q_learning import QLearning
+from traces import AGENTS
 import pygame
 import sys
 import numpy as np
 
-def main(training=True, difficulty=1000):
+# Colors (R, G, B)
+BLACK = pygame.Color(0, 0, 0)
+WHITE = pygame.Color(255, 255, 255)
+RED = pygame.Color(255, 0, 0)
+GREEN = pygame.Color(0, 255, 0)
+BLUE = pygame.Color(0, 0, 255)
+
+
+def draw_game(game_window, snake_body, food_pos):
+    """Draws the snake body and the food on the game window"""
+    game_window.fill(BLACK)
+    for pos in snake_body:
+        pygame.draw.rect(game_window, GREEN, pygame.Rect(pos[0], pos[1], 10, 10))
+
+    pygame.draw.rect(game_window, RED, pygame.Rect(food_pos[0], food_pos[1], 10, 10))
+
+
+def main(training=True, difficulty=1000, algorithm="q"):
+    # algorithm: "q" (one-step Q-learning), "nstep" (n-step returns) or "qlambda" (Watkins Q(lambda))
     # Window size
     FRAME_SIZE_X = 150
     FRAME_SIZE_Y = 150
     
-    # Colors (R, G, B)
-    BLACK = pygame.Color(0, 0, 0)
-    WHITE = pygame.Color(255, 255, 255)
-    RED = pygame.Color(255, 0, 0)
-    GREEN = pygame.Color(0, 255, 0)
-    BLUE = pygame.Color(0, 0, 255)
-    
     render_game = True # Show the game or not
     growing_body = True # Makes the body of the snake grow
 
@@ -35,10 +47,11 @@ def main(training=True, difficulty=1000):
     pygame.init()
     env = SnakeGameEnv(FRAME_SIZE_X, FRAME_SIZE_Y, growing_body)
 
+    agent = AGENTS[algorithm]
     if training: 
-        ql = QLearning(n_states=number_states, n_actions=number_actions)
+        ql = agent(n_states=number_states, n_actions=number_actions)
     else: 
-        ql = QLearning(n_states=number_states, n_actions=number_actions, epsilon=0)
+        ql = agent(n_states=number_states, n_actions=number_actions, epsilon=0)
     
 
 
@@ -48,6 +61,7 @@ def main(training=True, difficulty=1000):
     
     # Loading the table
     ql.load_q_table(filename="qtable_phase3.txt")
+    ql.compile_policy() # Greedy actions cached, kept up to date by the updates
         
     
     for episode in range(num_episodes):
@@ -92,14 +106,8 @@ def main(training=True, difficulty=1000):
             
             # Render
             if render_game:
-                game_window.fill(BLACK)
-                snake_body = env.get_body()
-                food_pos = env.get_food()
-                for pos in snake_body:
-                    pygame.draw.rect(game_window, GREEN, pygame.Rect(pos[0], pos[1], 10, 10))
-        
-                pygame.draw.rect(game_window, RED, pygame.Rect(food_pos[0], food_pos[1], 10, 10))
-            
+                draw_game(game_window, env.get_body(), env.get_food())
+
                 for event in pygame.event.get():
                     if event.type == pygame.QUIT:
                         pygame.quit()
@@ -108,6 +116,9 @@ def main(training=True, difficulty=1000):
                 pygame.display.flip()
                 fps_controller.tick(difficulty)
         
+        if training:
+            ql.end_episode()
+
         # Saving our table
         ql.save_q_table(filename="qtable_phase3.txt")
         # Saving out hyperparameters
@@ -0,0 +1,191 @@
+"""
+Snake Eater actor-learner training (Ape-X style)
+Actor processes play SnakeGameEnv with their own, possibly stale, copy of the Q-table and their
+own epsilon, and send batches of encoded transitions over a socket (TCP or Unix) to a single
+learner. The learner applies the Q-learning updates and sends a fresh copy of the table back
+to an actor whenever the actor's copy is at least sync_every versions old.
+
+Messages are a small header (kind, table version, payload size) followed by raw NumPy bytes,
+so a whole batch costs one send and one receive.
+"""
+import multiprocessing as mp
+import os
+import random
+import selectors
+import socket
+import struct
+import time
+import numpy as np
+from snake_env import SnakeGameEnv
+from q_learning import QLearning
+
+N_STATES = 320
+N_ACTIONS = 4
+
+HEADER = struct.Struct("<BIQ")  # kind, table version, payload length
+TRANSITIONS, ACK, TABLE = 0, 1, 2
+TRANSITION = np.dtype([("state", np.int16), ("action", np.int8), ("reward", np.float32), ("next_state", np.int16)])
+
+
+def recv_exactly(sock, n):
+    data = bytearray(n)
+    view = memoryview(data)
+    received = 0
+    while received < n:
+        chunk = sock.recv_into(view[received:], n - received)
+        if chunk == 0:
+            raise ConnectionError("Connection closed")
+        received += chunk
+    return data
+
+
+def send_message(sock, kind, version, payload=b""):
+    sock.sendall(HEADER.pack(kind, version, len(payload)) + payload)
+
+
+def recv_message(sock):
+    kind, version, length = HEADER.unpack(recv_exactly(sock, HEADER.size))
+    return kind, version, recv_exactly(sock, length) if length else b""
+
+
+def make_socket(address):
+    """Unix socket for a path, TCP for a (host, port) tuple"""
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+    return socket.socket(family, socket.SOCK_STREAM)
+
+
+def actor_epsilon(actor_id, n_actors, base=0.4, alpha=7):
+    """Ape-X exploration schedule: every actor gets a different fixed epsilon"""
+    if n_actors == 1:
+        return base
+    return base ** (1 + alpha * actor_id / (n_actors - 1))
+
+
+def actor(actor_id, address, epsilon, batch_size, seed, max_steps):
+    """Plays and sends transitions in batches until the learner closes the connection"""
+    random.seed(seed)
+    np.random.seed(seed)
+    env = SnakeGameEnv(150, 150, growing_body=True, seed=seed, verbose=False)
+    ql = QLearning(n_states=N_STATES, n_actions=N_ACTIONS, epsilon=epsilon)
+    ql.q_table = np.zeros((N_STATES, N_ACTIONS))
+    version = 0
+
+    sock = make_socket(address)
+    sock.connect(address)
+    batch = np.zeros(batch_size, dtype=TRANSITION)
+    n = 0
+    steps = 0
+    state = env.reset()
+    try:
+        while True:
+            enc_state = ql.encode_state3(state)
+            action = ql.choose_action(enc_state, [0, 1, 2, 3])
+            next_state, reward, game_over = env.step(action)
+            batch[n] = (enc_state, action, reward, ql.encode_state3(next_state))
+            n += 1
+            steps += 1
+            if game_over or steps >= max_steps:
+                state = env.reset()
+                steps = 0
+            else:
+                state = next_state
+
+            if n == batch_size:
+                send_message(sock, TRANSITIONS, version, batch.tobytes())
+                kind, new_version, payload = recv_message(sock)
+                if kind == TABLE:
+                    ql.q_table = np.frombuffer(payload, dtype=np.float64).reshape(N_STATES, N_ACTIONS).copy()
+                    version = new_version
+                n = 0
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        sock.close()
+
+
+class Learner:
+    def __init__(self, address, sync_every=10, **params):
+        self.ql = QLearning(n_states=N_STATES, n_actions=N_ACTIONS, **params)
+        self.ql.q_table = np.zeros((N_STATES, N_ACTIONS))
+        self.version = 0
+        self.sync_every = sync_every
+        self.transitions = 0
+
+        self.address = address
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)
+        self.listener = make_socket(address)
+        if not isinstance(address, str):
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(address)
+        self.listener.listen()
+        # The real address (with the port chosen by the OS when port 0 is requested)
+        self.address = self.listener.getsockname()
+
+    def apply(self, batch):
+        for state, action, reward, next_state in batch.tolist():
+            self.ql.update_q_value(state, action, reward, next_state)
+        self.transitions += len(batch)
+        self.version += 1
+
+    def serve(self, duration):
+        """Receives and applies transitions for duration seconds. Returns transitions per second"""
+        selector = selectors.DefaultSelector()
+        selector.register(self.listener, selectors.EVENT_READ)
+        connections = []
+        begin = time.perf_counter()
+        while time.perf_counter() - begin < duration:
+            for key, _ in selector.select(timeout=0.1):
+                if key.fileobj is self.listener:
+                    conn, _ = self.listener.accept()
+                    selector.register(conn, selectors.EVENT_READ)
+                    connections.append(conn)
+                    continue
+                conn = key.fileobj
+                try:
+                    kind, actor_version, payload = recv_message(conn)
+                    self.apply(np.frombuffer(payload, dtype=TRANSITION))
+                    if self.version - actor_version >= self.sync_every:
+                        send_message(conn, TABLE, self.version, self.ql.q_table.tobytes())
+                    else:
+                        send_message(conn, ACK, actor_version)
+                except (ConnectionError, OSError):
+                    selector.unregister(conn)
+                    connections.remove(conn)
+                    conn.close()
+        elapsed = time.perf_counter() - begin
+
+        for conn in connections:
+            conn.close()
+        selector.close()
+        self.listener.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        return self.transitions / elapsed
+
+
+def run(n_actors=4, duration=30, address=("127.0.0.1", 0), batch_size=256, sync_every=10,
+        seed=0, max_steps=2000, params=None, save_file="qtable_actor_learner.txt"):
+    """Starts the learner and n_actors actor processes on localhost and trains for duration seconds"""
+    learner = Learner(address, sync_every, **(params or {}))
+    actors = [mp.Process(target=actor, daemon=True,
+                         args=(i, learner.address, actor_epsilon(i, n_actors), batch_size, seed + i, max_steps))
+              for i in range(n_actors)]
+    for p in actors:
+        p.start()
+
+    rate = learner.serve(duration)
+    for p in actors:
+        p.join(timeout=5)
+        if p.is_alive():
+            p.terminate()
+
+    print(f"Learner: {learner.transitions} transitions in {duration}s ({rate:.0f} transitions/s), "
+          f"table version {learner.version}")
+    if save_file:
+        learner.ql.save_q_table(save_file)
+    return learner
+
+
+if __name__ == "__main__":
+    run(params={"alpha": 0.1, "gamma": 0.9})
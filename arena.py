@@ -0,0 +1,242 @@
+"""
+Snake Eater multi-snake arena
+Several snakes on one board, moved simultaneously every tick, for self-play and competitive
+evaluation. All snakes share one occupancy grid (with a one-cell wall border) holding the
+owner of every cell, so each move is resolved with one grid lookup per snake:
+    - every tail that does not grow leaves first (a snake can follow any tail, as in SnakeGameEnv)
+    - two or more heads entering the same cell: all of them die (head-to-head)
+    - a head entering an occupied cell: wall, its own body or another snake's body
+Head-to-head is found by counting the new heads in a scratch grid, so resolving the moves
+costs O(number of snakes) whatever the board size. Dead snakes are removed from the board.
+The states look for the nearest food of every snake, O(snakes x food), which stays linear in
+the snakes for a fixed number of food.
+
+Every agent gets the state of get_state3 (food_state towards its nearest food, forced danger
+and up to two more dangers, other snakes counting as dangers), so the phase 3 table plays
+as it is, and the rewards of SnakeGameEnv (100 apple, -75 death, +-15 closer/farther).
+step takes the actions of all the agents and returns their encode_state3 indices in one array,
+ready for a batched policy lookup; get_states decodes them to get_state3 tuples when needed.
+"""
+import random
+import time
+from collections import deque
+import numpy as np
+from snake_env import SnakeGameEnv
+from state_spec import PHASE3
+from policy_server import FOOD_INDEX, DANGER_CODE, OPPOSITE_SIDE, load_policy
+
+DIRECTIONS = ["UP", "DOWN", "LEFT", "RIGHT"]
+EMPTY, WALL = 0, -1  # Grid values; the cells of snake i hold i + 1
+CAUSES = ["wall", "self", "other", "head-to-head"]
+
+
+class SnakeArena:
+    def __init__(self, n_snakes=2, frame_size_x=150, frame_size_y=150, n_food=1, growing_body=True, seed=None):
+        self.width, self.height = frame_size_x // 10, frame_size_y // 10
+        if n_snakes >= self.height:
+            raise ValueError(f"At most {self.height - 1} snakes fit on a board {self.height} cells high")
+        self.n_snakes = n_snakes
+        self.n_food = n_food
+        self.growing_body = growing_body
+        self.rng = random.Random(seed)
+        self.row = self.width + 2  # Cells per grid row, border included
+        self.offsets = np.array([-self.row, self.row, -1, 1])  # Neighbour cell per direction / side
+        self.claims = np.zeros((self.height + 2) * self.row, dtype=np.int32)  # Scratch head counts
+        self.reset()
+
+    def cell(self, x, y):
+        """Grid index of a board position in pixels"""
+        return (y // 10 + 1) * self.row + x // 10 + 1
+
+    def position(self, cells):
+        """[x, y] in pixels of a grid index (or a list of them)"""
+        cells = np.asarray(cells)
+        return np.stack(((cells % self.row - 1) * 10, (cells // self.row - 1) * 10), axis=-1).tolist()
+
+    def reset(self):
+        """
+        Snakes of 3 blocks on evenly spaced rows, the even ones on the left moving left and the
+        odd ones mirrored on the right; returns the encoded states of all the agents
+        """
+        self.grid = np.full((self.height + 2, self.row), WALL, dtype=np.int16)
+        self.grid[1:-1, 1:-1] = EMPTY
+        self.grid = self.grid.ravel()
+        self.is_food = np.zeros(len(self.grid), dtype=bool)
+        self.bodies = []
+        self.direction = np.zeros(self.n_snakes, dtype=np.int64)
+        for i in range(self.n_snakes):
+            y = (i + 1) * self.height // (self.n_snakes + 1) * 10
+            if i % 2 == 0:
+                xs, direction = (50, 60, 70), "LEFT"
+            else:
+                xs, direction = [self.width * 10 - 10 - x for x in (50, 60, 70)], "RIGHT"
+            body = deque(self.cell(x, y) for x in xs)
+            for block in body:
+                self.grid[block] = i + 1
+            self.bodies.append(body)
+            self.direction[i] = DIRECTIONS.index(direction)
+        self.heads = np.array([body[0] for body in self.bodies], dtype=np.int64)
+        self.alive = np.ones(self.n_snakes, dtype=bool)
+        self.scores = np.zeros(self.n_snakes, dtype=np.int64)  # +100 per apple, -1 per other step
+        self.causes = [None] * self.n_snakes
+        self.steps = 0
+        self.game_over = False
+        self.food = np.array([self.spawn_food() for _ in range(self.n_food)], dtype=np.int64)
+        return self.encode()
+
+    def spawn_food(self):
+        while True:
+            cell = self.cell(self.rng.randrange(0, self.width * 10, 10), self.rng.randrange(0, self.height * 10, 10))
+            if self.grid[cell] == EMPTY and not self.is_food[cell]:
+                self.is_food[cell] = True
+                return cell
+
+    def distances(self, cells, food):
+        return np.abs(food % self.row - cells % self.row) + np.abs(food // self.row - cells // self.row)
+
+    def nearest_food(self, heads):
+        """Nearest food cell of each head (the first one on ties)"""
+        distances = self.distances(heads[:, None], self.food[None, :])
+        return self.food[np.argmin(distances, axis=1)]
+
+    def encode(self, agents=None):
+        """encode_state3 of the state of the agents (all by default)"""
+        agents = np.arange(self.n_snakes) if agents is None else agents
+        heads, directions = self.heads[agents], self.direction[agents]
+        food = self.nearest_food(heads)
+        dx = np.sign(food % self.row - heads % self.row)
+        dy = np.sign(food // self.row - heads // self.row)
+        bits = np.zeros(len(agents), dtype=np.int64)
+        for side, offset in enumerate(self.offsets):
+            danger = (self.grid[heads + offset] != EMPTY) & (OPPOSITE_SIDE[directions] != side)
+            bits |= danger.astype(np.int64) << side
+        return FOOD_INDEX[dx + 1, dy + 1] * 40 + DANGER_CODE[directions, bits]
+
+    def get_states(self):
+        """get_state3 tuple (food_state, danger) of every agent"""
+        return [PHASE3.decode(index) for index in self.encode().tolist()]
+
+    def step(self, actions):
+        """
+        Moves all the living snakes at once with their actions (0 up, 1 down, 2 left, 3 right).
+        Returns (encoded states, rewards, dones) with one entry per agent; dead agents get 0 reward.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        agents = np.flatnonzero(self.alive)
+        rewards = np.zeros(self.n_snakes, dtype=np.int64)
+
+        directions = self.direction[agents]
+        directions = np.where(actions[agents] == OPPOSITE_SIDE[directions], directions, actions[agents])
+        heads = self.heads[agents]
+        new_heads = heads + self.offsets[directions]
+        target = self.nearest_food(heads)
+        eat = self.is_food[new_heads]
+        grow = eat & self.growing_body
+
+        # Tails leave first, then every head is checked against the grid and the other heads
+        for agent in agents[~grow].tolist():
+            self.grid[self.bodies[agent].pop()] = EMPTY
+        np.add.at(self.claims, new_heads, 1)
+        head_to_head = self.claims[new_heads] > 1
+        self.claims[new_heads] = 0
+        owners = self.grid[new_heads]
+        dead = head_to_head | (owners != EMPTY)
+        eat &= ~dead
+
+        rewards[agents] = np.where(self.distances(new_heads, target) < self.distances(heads, target), 15, -15)
+        rewards[agents[eat]] = 100
+        rewards[agents[dead]] = -75
+        self.scores[agents] += np.where(eat, 100, -1)
+
+        for agent, owner, collided in zip(agents[dead].tolist(), owners[dead].tolist(), head_to_head[dead].tolist()):
+            self.causes[agent] = ("head-to-head" if collided else "wall" if owner == WALL
+                                  else "self" if owner == agent + 1 else "other")
+            for block in self.bodies[agent]:
+                self.grid[block] = EMPTY
+            self.bodies[agent].clear()
+        for agent, head in zip(agents[~dead].tolist(), new_heads[~dead].tolist()):
+            self.bodies[agent].appendleft(head)
+            self.grid[head] = agent + 1
+        self.alive[agents[dead]] = False
+        self.heads[agents[~dead]] = new_heads[~dead]
+        self.direction[agents] = directions
+
+        for cell in new_heads[eat].tolist():
+            self.is_food[cell] = False
+            self.food[self.food == cell] = self.spawn_food()
+
+        self.steps += 1
+        self.game_over = not self.alive.any()
+        return self.encode(), rewards, ~self.alive
+
+    def get_body(self, agent):
+        return self.position(list(self.bodies[agent]))
+
+    def get_food(self):
+        return self.position(self.food)
+
+    def agent_env(self, agent):
+        """
+        SnakeGameEnv seen by an agent: its body followed by the other snakes (so they are dangers)
+        and its nearest food; get_state3 of it is the state of the agent
+        """
+        env = SnakeGameEnv(self.width * 10, self.height * 10, self.growing_body, verbose=False)
+        others = [block for other, body in enumerate(self.bodies) if other != agent for block in body]
+        env.snake_body = self.position(list(self.bodies[agent]) + others)
+        env.snake_pos = list(env.snake_body[0])
+        env.food_pos = self.position(self.nearest_food(self.heads[agent:agent + 1])[0])
+        env.direction = DIRECTIONS[self.direction[agent]]
+        return env
+
+
+def play(arena, policies, max_steps=2000):
+    """
+    One game where agent i plays the greedy action array policies[i] (one array for all).
+    Returns the scores, lengths (0 when dead) and causes of death of the agents.
+    """
+    policies = policies if isinstance(policies, list) else [policies] * arena.n_snakes
+    shared = all(policy is policies[0] for policy in policies)
+    codes = arena.reset()
+    while not arena.game_over and arena.steps < max_steps:
+        if shared:
+            actions = policies[0][codes]  # One lookup for every agent
+        else:
+            actions = np.array([policy[code] for policy, code in zip(policies, codes)])
+        codes = arena.step(actions)[0]
+    return arena.scores.copy(), np.array([len(body) for body in arena.bodies]), list(arena.causes)
+
+
+def evaluate(n_snakes=(1, 2, 4), n_games=200, table_file="qtable_phase3.txt", seed=0):
+    """Self-play of the greedy phase 3 policy: mean score per agent and causes of death"""
+    policy = load_policy(table_file)
+    for n in n_snakes:
+        arena = SnakeArena(n, seed=seed)
+        scores, causes = [], []
+        for _ in range(n_games):
+            game_scores, _, game_causes = play(arena, policy)
+            scores.extend(game_scores)
+            causes.extend(game_causes)
+        counts = {cause: causes.count(cause) for cause in CAUSES + [None]}
+        print(f"{n} snakes: mean score per agent {np.mean(scores):.1f}, deaths {counts}")
+
+
+def benchmark(snake_counts=(4, 16, 64, 256), frame_size=3000, n_food=8, ticks=300, seed=0):
+    """Tick time against the number of snakes on a large board, with a fixed number of food"""
+    policy = load_policy()
+    for n in snake_counts:
+        arena = SnakeArena(n, frame_size, frame_size, n_food=n_food, seed=seed)
+        codes = arena.reset()
+        moves = 0
+        begin = time.perf_counter()
+        for _ in range(ticks):
+            if arena.game_over:
+                codes = arena.reset()
+            moves += int(arena.alive.sum())
+            codes = arena.step(policy[codes])[0]
+        elapsed = time.perf_counter() - begin
+        print(f"{n} snakes: {elapsed / ticks * 1e3:.3f} ms per tick, {elapsed / moves * 1e6:.1f} us per snake move")
+
+
+if __name__ == "__main__":
+    evaluate()
+    benchmark()
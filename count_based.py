@@ -0,0 +1,108 @@
+"""
+Snake Eater count-based Q-learning
+Keeps a visit counter N(s, a) next to the Q-table, so that
+    - the learning rate can shrink with the visits of each entry: alpha = f(N(s, a))
+    - exploration can favour rarely tried actions with a UCB bonus
+          c * sqrt(ln(N(s) + 1) / (N(s, a) + 1))
+      or with an optimistic initial Q-value,
+instead of one fixed alpha and one global epsilon for every state.
+"""
+import random
+import numpy as np
+from q_learning import QLearning
+from training import steps_to_target
+
+
+class CountBasedQLearning(QLearning):
+    def __init__(self, n_states, n_actions, alpha=0.2, gamma=0.8, epsilon=0.0, epsilon_min=0, epsilon_decay=1,
+                 alpha_schedule="constant", alpha_power=0.6, min_alpha=0.01, ucb=0.0, optimistic=0.0):
+        """
+        alpha_schedule: "constant" (alpha), "inverse" (1 / N) or "polynomial" (1 / N ** alpha_power),
+                        never below min_alpha
+        ucb:            weight c of the exploration bonus (0 disables it)
+        optimistic:     initial value of every Q-value of an empty table
+        """
+        super().__init__(n_states, n_actions, alpha, gamma, epsilon, epsilon_min, epsilon_decay)
+        self.alpha_schedule = alpha_schedule
+        self.alpha_power = alpha_power
+        self.min_alpha = min_alpha
+        self.ucb = ucb
+        self.q_table = np.full((n_states, n_actions), float(optimistic))
+        self.visits = np.zeros((n_states, n_actions), dtype=np.int64)
+
+    def learning_rate(self, visits):
+        if self.alpha_schedule == "inverse":
+            return max(self.min_alpha, 1.0 / visits)
+        if self.alpha_schedule == "polynomial":
+            return max(self.min_alpha, visits ** -self.alpha_power)
+        return self.alpha
+
+    def choose_action(self, state, allowed_actions):
+        if np.random.uniform(0, 1) < self.epsilon:
+            action = random.choice(allowed_actions)  # Explore
+        elif self.ucb:
+            # Exploit with a bonus for the actions tried least in this state
+            visits = self.visits[state]
+            bonus = self.ucb * np.sqrt(np.log(visits.sum() + 1) / (visits + 1))
+            action = np.argmax(self.q_table[state] + bonus)
+        else:
+            action = np.argmax(self.q_table[state])  # Exploit
+
+        self.epsilon = max(self.epsilon_min, self.epsilon_decay * self.epsilon)
+        return action
+
+    def update_q_value(self, enc_state, action, reward, enc_next_state):
+        self.visits[enc_state][action] += 1
+        alpha = self.learning_rate(self.visits[enc_state][action])
+        current_q = self.q_table[enc_state][action]
+
+        # Terminal state if snake dies
+        if reward == -75:
+            new_q = (1 - alpha) * current_q + alpha * reward
+        # Non-terminal state
+        else:
+            new_q = (1 - alpha) * current_q + alpha * (reward + self.gamma * np.max(self.q_table[enc_next_state]))
+        self.q_table[enc_state][action] = new_q
+
+    def save_q_table(self, filename="qtable.txt"):
+        np.savetxt(filename, self.q_table)
+        np.savetxt(counts_file(filename), self.visits, fmt="%d")
+
+    def load_q_table(self, filename="qtable.txt"):
+        super().load_q_table(filename)
+        try:
+            self.visits = np.loadtxt(counts_file(filename), dtype=np.int64)
+        except IOError:
+            self.visits = np.zeros((self.n_states, self.n_actions), dtype=np.int64)
+
+
+def counts_file(filename):
+    """The visit counts are stored next to the Q-table: qtable.txt -> qtable_counts.txt"""
+    base, dot, extension = filename.rpartition(".")
+    return f"{base}_counts.{extension}" if dot else f"{filename}_counts"
+
+
+def plain_agent():
+    # Best values after hyperparameter tuning (see q_learning.py)
+    ql = QLearning(n_states=320, n_actions=4, alpha=0.1, gamma=0.9, epsilon=0.05)
+    ql.q_table = np.zeros((320, 4))
+    return ql
+
+
+def compare(target=1500, seeds=(0, 1, 2), **kwargs):
+    """Steps to the target for the current epsilon-greedy setup and the count-based variants"""
+    configs = {
+        "epsilon-greedy": plain_agent,
+        "1/N^0.6 alpha + UCB": lambda: CountBasedQLearning(320, 4, gamma=0.9, alpha_schedule="polynomial", ucb=2),
+        "1/N^0.6 alpha + optimistic": lambda: CountBasedQLearning(320, 4, gamma=0.9, alpha_schedule="polynomial",
+                                                                   optimistic=100),
+    }
+    results = {}
+    for name, make in configs.items():
+        results[name] = [steps_to_target(make(), target, seed=seed, **kwargs) for seed in seeds]
+        print(f"{name}: environment steps to a greedy mean score of {target}: {results[name]}")
+    return results
+
+
+if __name__ == "__main__":
+    compare()
@@ -0,0 +1,119 @@
+"""
+Snake Eater Dyna-Q with prioritized sweeping
+Besides the Q-table, the agent learns an empirical model of the 320 encoded states from its
+real transitions (counts in NumPy arrays):
+    transitions[s, a, s'] -> times s' followed (s, a) without dying
+    deaths[s, a]          -> times (s, a) ended the game
+    reward_sums[s, a]     -> sum of the rewards of (s, a)
+After every real step it performs `planning_steps` expected updates on the model. With
+prioritized sweeping, the pairs are taken from a priority queue ordered by the size of their
+TD error, and the predecessors of every updated state are queued in turn, so a large change
+(an apple, a death) is propagated backwards first.
+"""
+import heapq
+import numpy as np
+from q_learning import QLearning
+from training import steps_to_target
+
+
+class DynaQLearning(QLearning):
+    def __init__(self, n_states, n_actions, alpha=0.2, gamma=0.8, epsilon=0.05, epsilon_min=0, epsilon_decay=1,
+                 planning_steps=10, prioritized=True, theta=1e-2, seed=0):
+        super().__init__(n_states, n_actions, alpha, gamma, epsilon, epsilon_min, epsilon_decay)
+        self.planning_steps = planning_steps
+        self.prioritized = prioritized
+        self.theta = theta  # Minimum priority to enter the queue
+        self.rng = np.random.default_rng(seed)
+        self.transitions = np.zeros((n_states, n_actions, n_states), dtype=np.int32)
+        self.deaths = np.zeros((n_states, n_actions), dtype=np.int32)
+        self.reward_sums = np.zeros((n_states, n_actions))
+        self.visits = np.zeros((n_states, n_actions), dtype=np.int32)
+        self.queue = []  # (-priority, state, action), may hold stale duplicates
+
+    def expected_target(self, state, action):
+        """r(s, a) + gamma * E[max Q(s')] under the learned model (dying contributes no future)"""
+        n = self.visits[state, action]
+        future = self.transitions[state, action] @ np.max(self.q_table, axis=1)
+        return (self.reward_sums[state, action] + self.gamma * future) / n
+
+    def update_q_value(self, enc_state, action, reward, enc_next_state):
+        # Learn the model
+        self.visits[enc_state, action] += 1
+        self.reward_sums[enc_state, action] += reward
+        if reward == -75:
+            self.deaths[enc_state, action] += 1
+        else:
+            self.transitions[enc_state, action, enc_next_state] += 1
+
+        # Direct reinforcement learning from the real transition
+        super().update_q_value(enc_state, action, reward, enc_next_state)
+
+        if self.prioritized:
+            self.push(enc_state, action)
+            self.sweep()
+        else:
+            self.plan_random()
+
+    def push(self, state, action):
+        priority = abs(self.expected_target(state, action) - self.q_table[state, action])
+        if priority > self.theta:
+            heapq.heappush(self.queue, (-priority, state, action))
+
+    def sweep(self):
+        """Prioritized sweeping: largest TD errors first, then the predecessors of the updated states"""
+        for _ in range(self.planning_steps):
+            if not self.queue:
+                break
+            _, state, action = heapq.heappop(self.queue)
+            target = self.expected_target(state, action)
+            self.q_table[state, action] += self.alpha * (target - self.q_table[state, action])
+            self.refresh_policy(state)
+
+            # All (s, a) seen leading to `state`, with their TD errors computed at once
+            pred_states, pred_actions = np.nonzero(self.transitions[:, :, state])
+            if len(pred_states) == 0:
+                continue
+            counts = self.transitions[pred_states, pred_actions]
+            targets = (self.reward_sums[pred_states, pred_actions]
+                       + self.gamma * counts @ np.max(self.q_table, axis=1)) / self.visits[pred_states, pred_actions]
+            priorities = np.abs(targets - self.q_table[pred_states, pred_actions])
+            for p, s, a in zip(priorities, pred_states, pred_actions):
+                if p > self.theta:
+                    heapq.heappush(self.queue, (-p, int(s), int(a)))
+
+    def plan_random(self):
+        """Plain Dyna-Q: expected updates on uniformly sampled previously seen pairs"""
+        seen_states, seen_actions = np.nonzero(self.visits)
+        for i in self.rng.integers(0, len(seen_states), self.planning_steps):
+            state, action = seen_states[i], seen_actions[i]
+            target = self.expected_target(state, action)
+            self.q_table[state, action] += self.alpha * (target - self.q_table[state, action])
+            self.refresh_policy(state)
+
+    def end_episode(self):
+        # Keep the queue small between episodes; the model itself is kept
+        del self.queue[10 * self.planning_steps:]
+        heapq.heapify(self.queue)
+
+
+def compare(target=1500, seeds=(0, 1, 2), planning_steps=10, **kwargs):
+    """Real environment steps to the target greedy score: Q-learning, Dyna-Q, Dyna-Q with prioritized sweeping"""
+    def agent(cls, **extra):
+        ql = cls(n_states=320, n_actions=4, alpha=0.1, gamma=0.9, epsilon=0.05, **extra)
+        ql.q_table = np.zeros((320, 4))
+        return ql
+
+    configs = {
+        "Q-learning": lambda: agent(QLearning),
+        "Dyna-Q": lambda: agent(DynaQLearning, planning_steps=planning_steps, prioritized=False),
+        "Prioritized sweeping": lambda: agent(DynaQLearning, planning_steps=planning_steps),
+    }
+    results = {}
+    for name, make in configs.items():
+        results[name] = [steps_to_target(make(), target, seed=seed, **kwargs) for seed in seeds]
+        print(f"{name}: environment steps to a greedy mean score of {target}: {results[name]}")
+    return results
+
+
+if __name__ == "__main__":
+    compare()
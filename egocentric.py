@@ -0,0 +1,178 @@
+"""
+Snake Eater egocentric mode
+The phase 3 encoding uses four absolute actions (one of them, reversing, does nothing) and
+stores the same situation once per heading. Here the state is expressed relative to the
+heading of the snake, with three relative actions:
+    0 -> turn left, 1 -> go straight, 2 -> turn right
+
+-- Food --
+Relative direction of the food, as (forward, lateral) signs with forward in {-1, 0, 1}
+(behind, level, ahead) and lateral in {-1, 0, 1} (right, level, left): 8 possibilities.
+
+-- Danger --
+Immediate danger on the left, straight ahead and on the right: 3 bits, 8 possibilities.
+
+state_index = food_index * 8 + danger_code, giving 64 states x 3 actions instead of 320 x 4.
+Converters map tables between this mode and the phase 3 absolute tables.
+"""
+import numpy as np
+from q_learning import QLearning
+from state_spec import PHASE3
+
+N_STATES = 64
+N_ACTIONS = 3
+LEFT, STRAIGHT, RIGHT = 0, 1, 2
+
+ABSOLUTE_ACTIONS = ["UP", "DOWN", "LEFT", "RIGHT"]
+# Screen coordinates: y grows downwards
+VECTORS = {"UP": (0, -1), "DOWN": (0, 1), "LEFT": (-1, 0), "RIGHT": (1, 0)}
+DANGER_KEYS = {"UP": "top", "DOWN": "bottom", "LEFT": "left", "RIGHT": "right"}
+OPPOSITES = {"top": "DOWN", "bottom": "UP", "left": "RIGHT", "right": "LEFT"}
+FOOD_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+
+def turn(direction, rel_action):
+    """Absolute direction after applying a relative action to the current heading"""
+    x, y = VECTORS[direction]
+    if rel_action == LEFT:
+        x, y = y, -x
+    elif rel_action == RIGHT:
+        x, y = -y, x
+    return next(d for d, v in VECTORS.items() if v == (x, y))
+
+
+def to_absolute_action(direction, rel_action):
+    return ABSOLUTE_ACTIONS.index(turn(direction, rel_action))
+
+
+def to_relative_action(direction, abs_action):
+    """Relative action equivalent to an absolute one. Reversing is ignored by the game, so it is STRAIGHT"""
+    for rel_action in (LEFT, STRAIGHT, RIGHT):
+        if to_absolute_action(direction, rel_action) == abs_action:
+            return rel_action
+    return STRAIGHT
+
+
+def relative_food(direction, food_vector):
+    """(forward, lateral) signs of an absolute food direction vector seen from the heading"""
+    hx, hy = VECTORS[direction]
+    lx, ly = hy, -hx  # Left of the heading
+    forward = int(np.sign(food_vector[0] * hx + food_vector[1] * hy))
+    lateral = int(np.sign(food_vector[0] * lx + food_vector[1] * ly))
+    return forward, lateral
+
+
+def get_state_egocentric(env):
+    """Egocentric state of a SnakeGameEnv: ((forward, lateral), (danger_left, danger_straight, danger_right))"""
+    head_x, head_y = env.snake_body[0]
+    food_vector = (int(np.sign(env.food_pos[0] - head_x)), int(np.sign(env.food_pos[1] - head_y)))
+    danger_dict = env.calculate_danger()
+    danger = tuple(danger_dict[DANGER_KEYS[turn(env.direction, a)]] for a in (LEFT, STRAIGHT, RIGHT))
+    return relative_food(env.direction, food_vector), danger
+
+
+def encode_state_egocentric(state):
+    food, (left, straight, right) = state
+    return FOOD_DIRECTIONS.index(food) * 8 + left * 4 + straight * 2 + right
+
+
+def from_state3(state):
+    """
+    Converts a phase 3 state (food_state, (forced, add1, add2)) to (egocentric state, heading).
+    The heading is the opposite of the forced danger.
+    """
+    food_state, danger = state
+    direction = OPPOSITES[danger[0]]
+    names = [food_state] if isinstance(food_state, str) else list(food_state)
+    food_vector = tuple(int(sum(VECTORS[name][i] for name in names)) for i in (0, 1))
+    blocked = {d for d in danger[1:] if d != "none"}
+    ego_danger = tuple(int(DANGER_KEYS[turn(direction, a)] in blocked) for a in (LEFT, STRAIGHT, RIGHT))
+    return (relative_food(direction, food_vector), ego_danger), direction
+
+
+def all_states3():
+    """Every phase 3 state tuple, indexed by its encode_state3 code"""
+    return list(PHASE3.states)
+
+
+def absolute_table_from_relative(q_rel):
+    """Builds a 320 x 4 phase 3 table that follows the same policy as an egocentric 64 x 3 table"""
+    q_abs = np.zeros((320, 4))
+    for index, state in enumerate(all_states3()):
+        ego_state, direction = from_state3(state)
+        row = q_rel[encode_state_egocentric(ego_state)]
+        for abs_action in range(4):
+            q_abs[index, abs_action] = row[to_relative_action(direction, abs_action)]
+    return q_abs
+
+
+def relative_table_from_absolute(q_abs):
+    """
+    Builds an egocentric 64 x 3 table from a phase 3 table by averaging, for every egocentric state,
+    the rows of the absolute states that map to it (unvisited all-zero rows are skipped).
+    Phase 3 keeps at most two dangers besides the forced one, so the egocentric states with
+    danger on all three sides have no absolute counterpart and stay at zero.
+    """
+    sums = np.zeros((N_STATES, N_ACTIONS))
+    counts = np.zeros(N_STATES)
+    for index, state in enumerate(all_states3()):
+        if not np.any(q_abs[index]):
+            continue
+        ego_state, direction = from_state3(state)
+        ego_index = encode_state_egocentric(ego_state)
+        sums[ego_index] += [q_abs[index, to_absolute_action(direction, a)] for a in (LEFT, STRAIGHT, RIGHT)]
+        counts[ego_index] += 1
+    return sums / np.maximum(counts, 1)[:, None]
+
+
+def run_episode_egocentric(env, ql, training=True, max_steps=None):
+    """Same as training.run_episode with the egocentric state and actions"""
+    env.reset()
+    enc_state = encode_state_egocentric(get_state_egocentric(env))
+    total_reward = 0
+    score = 0
+    steps = 0
+    game_over = False
+    while not game_over:
+        rel_action = ql.choose_action(enc_state, [LEFT, STRAIGHT, RIGHT])
+        _, reward, game_over = env.step(to_absolute_action(env.direction, rel_action))
+        enc_next_state = encode_state_egocentric(get_state_egocentric(env))
+        score += 100 if reward == 100 else -1
+        if training:
+            ql.update_q_value(enc_state, rel_action, reward, enc_next_state)
+        enc_state = enc_next_state
+        total_reward += reward
+        steps += 1
+        if max_steps and steps >= max_steps:
+            break
+
+    if training:
+        ql.end_episode()
+    return score, total_reward, len(env.get_body()), steps
+
+
+def compare(episodes=1000, target=1000, seeds=(0, 1, 2), alpha=0.1, gamma=0.9, epsilon=0.05, max_steps=2000):
+    """Episodes needed by the absolute (320 x 4) and egocentric (64 x 3) learners to reach the target score"""
+    import random
+    from snake_env import SnakeGameEnv
+    from training import run_episode, episodes_to_target
+
+    results = {"absolute": [], "egocentric": []}
+    for seed in seeds:
+        for mode, n_states, n_actions, run in (("absolute", 320, 4, run_episode),
+                                               ("egocentric", N_STATES, N_ACTIONS, run_episode_egocentric)):
+            random.seed(seed)
+            np.random.seed(seed)
+            env = SnakeGameEnv(150, 150, growing_body=True, seed=seed, verbose=False)
+            ql = QLearning(n_states=n_states, n_actions=n_actions, alpha=alpha, gamma=gamma, epsilon=epsilon)
+            ql.q_table = np.zeros((n_states, n_actions))
+            scores = [run(env, ql, training=True, max_steps=max_steps)[0] for _ in range(episodes)]
+            results[mode].append(episodes_to_target(scores, target))
+
+    for mode, reached in results.items():
+        print(f"{mode}: episodes to reach a mean score of {target}: {reached}")
+    return results
+
+
+if __name__ == "__main__":
+    compare()
@@ -0,0 +1,199 @@
+"""
+Snake Eater offline frame exporter
+Rasterizes recorded or freshly simulated episodes in memory (pure NumPy, no display needed)
+and writes them as animated GIFs or PNG sequences, encoding several episodes in parallel.
+Frames are drawn while they are written, so long episodes are never held in memory.
+"""
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from snake_env import SnakeGameEnv
+from q_learning import QLearning
+
+CELL = 10  # Size of a block in the game, in pixels
+
+# Palette indices and their colors (R, G, B), same as the pygame window
+BACKGROUND, SNAKE, FOOD = 0, 1, 2
+PALETTE = np.array([[0, 0, 0], [0, 255, 0], [255, 0, 0]], dtype=np.uint8)
+
+
+def rasterize(snake_body, food_pos, frame_size_x=150, frame_size_y=150, scale=1):
+    """
+    Draws one frame as an array of palette indices with shape (frame_size_y * scale, frame_size_x * scale).
+    The board is drawn at one pixel per cell and then upscaled, so the cost does not depend on the
+    pixel size. Blocks outside the board (the head after hitting a wall) are skipped.
+    """
+    rows, cols = frame_size_y // CELL, frame_size_x // CELL
+    grid = np.zeros((rows, cols), dtype=np.uint8)
+
+    body = np.asarray(snake_body, dtype=np.int64).reshape(-1, 2) // CELL
+    inside = (body[:, 0] >= 0) & (body[:, 0] < cols) & (body[:, 1] >= 0) & (body[:, 1] < rows)
+    grid[body[inside, 1], body[inside, 0]] = SNAKE
+    grid[food_pos[1] // CELL, food_pos[0] // CELL] = FOOD
+
+    pixels = CELL * scale
+    return np.repeat(np.repeat(grid, pixels, axis=0), pixels, axis=1)
+
+
+def to_rgb(frame):
+    """Converts a frame of palette indices to an (H, W, 3) RGB array"""
+    return PALETTE[frame]
+
+
+def simulate_episode(q_table_file="qtable_phase3.txt", seed=None, max_steps=10000):
+    """
+    Plays one greedy episode with the given Q-table.
+    Returns the list of (snake_body, food_pos) for every step, including the initial one.
+    """
+    env = SnakeGameEnv(150, 150, growing_body=True, seed=seed, verbose=False)
+    ql = QLearning(n_states=320, n_actions=4, epsilon=0)
+    ql.load_q_table(q_table_file)
+
+    state = env.reset()
+    states = [([list(b) for b in env.get_body()], list(env.get_food()))]
+    game_over = False
+    while not game_over and len(states) <= max_steps:
+        action = ql.choose_action(ql.encode_state3(state), [0, 1, 2, 3])
+        state, reward, game_over = env.step(action)
+        states.append(([list(b) for b in env.get_body()], list(env.get_food())))
+    return states
+
+
+def replay_episode(filename):
+    """Reads every step of a replay file written by replay.ReplayWriter"""
+    from replay import ReplayReader
+
+    reader = ReplayReader(filename)
+    env = reader.state_at(0)
+    states = [([list(b) for b in env.get_body()], list(env.get_food()))]
+    for step in range(reader.n_steps):
+        env.step(reader.action_at(step))
+        states.append(([list(b) for b in env.get_body()], list(env.get_food())))
+    reader.close()
+    return states
+
+
+def png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+
+def write_png(filename, frame):
+    """Writes a frame of palette indices as an indexed PNG, using only zlib"""
+    height, width = frame.shape
+    # Every scanline starts with the filter type byte (0 = no filter)
+    raw = np.zeros((height, width + 1), dtype=np.uint8)
+    raw[:, 1:] = frame
+    with open(filename, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)))
+        f.write(png_chunk(b"PLTE", PALETTE.tobytes()))
+        f.write(png_chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        f.write(png_chunk(b"IEND", b""))
+
+
+def gif_frame(frame, left=0, top=0):
+    """
+    Pillow encodes the frame as a one frame GIF; returns (header, image), the header up to the
+    global palette and the image block moved to the given offset
+    """
+    from io import BytesIO
+    from PIL import Image
+
+    image = Image.frombytes("P", (frame.shape[1], frame.shape[0]), frame.tobytes())
+    image.putpalette(PALETTE.flatten().tolist())
+    buffer = BytesIO()
+    image.save(buffer, format="GIF", optimize=False)
+    data = buffer.getvalue()
+    flags = data[10]
+    start = 13 + (3 << ((flags & 7) + 1) if flags & 0x80 else 0)  # After the global palette
+    # The image descriptor starts with "," followed by its left and top offsets; drop the trailer
+    return data[:start], data[start:start + 1] + struct.pack("<HH", left, top) + data[start + 5:-1]
+
+
+def write_gif(filename, frames, fps=15):
+    """
+    Writes the frames as an animated GIF (requires Pillow for the LZW coding). Frames are written
+    as they come, each one reduced to the box that changed since the previous one, so only two
+    frames are kept in memory whatever the length of the episode.
+    """
+    delay = struct.pack("<H", int(100 / fps))  # GIF delays are in hundredths of a second
+    control = b"\x21\xf9\x04\x00" + delay + b"\x00\x00"  # Graphic control extension, no disposal
+    previous = None
+    with open(filename, "wb") as f:
+        for frame in frames:
+            if previous is None:
+                header, image = gif_frame(frame)
+                # GIF89a header followed by the NETSCAPE2.0 extension to loop forever
+                f.write(b"GIF89a" + header[6:] + b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+            else:
+                rows, cols = np.nonzero(frame != previous)
+                if len(rows) == 0:
+                    image = gif_frame(frame[:1, :1])[1]  # Same picture, one pixel keeps the timing
+                else:
+                    top, bottom, left, right = rows.min(), rows.max() + 1, cols.min(), cols.max() + 1
+                    image = gif_frame(frame[top:bottom, left:right], int(left), int(top))[1]
+            f.write(control + image)
+            previous = frame
+        f.write(b";")
+
+
+def export_episode(job):
+    """
+    Worker: rasterizes and writes one episode. job is a dict with
+        source  -> replay filename, or None to simulate with q_table_file and seed
+        output  -> .gif filename, or a directory for a PNG sequence
+    Returns (output, number of frames).
+    """
+    if job.get("source"):
+        states = replay_episode(job["source"])
+    else:
+        states = simulate_episode(job.get("q_table_file", "qtable_phase3.txt"), job.get("seed"),
+                                  job.get("max_steps", 10000))
+
+    scale = job.get("scale", 2)
+    frames = (rasterize(body, food, scale=scale) for body, food in states)  # Drawn as they are written
+
+    output = job["output"]
+    if output.endswith(".gif"):
+        write_gif(output, frames, job.get("fps", 15))
+    else:
+        os.makedirs(output, exist_ok=True)
+        for i, frame in enumerate(frames):
+            write_png(os.path.join(output, f"frame_{i:05d}.png"), frame)
+    return output, len(states)
+
+
+def export_episodes(jobs, processes=None):
+    """Encodes every job in a process pool, one episode per task"""
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(export_episode, jobs))
+
+
+def episode_length(args):
+    q_table_file, seed, max_steps = args
+    states = simulate_episode(q_table_file, seed, max_steps)
+    return seed, len(states[-1][0])
+
+
+def export_highlights(n_episodes=50, top_k=5, q_table_file="qtable_phase3.txt", output_dir="highlights",
+                      processes=None, max_steps=10000):
+    """
+    Simulates n_episodes greedy games, keeps the top_k by final snake length and exports them as GIFs.
+    The greedy agent is deterministic given the environment seed, so the selected games are simply
+    simulated again inside the exporting workers.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        lengths = list(pool.map(episode_length, [(q_table_file, seed, max_steps) for seed in range(n_episodes)]))
+
+    best = sorted(lengths, key=lambda item: item[1], reverse=True)[:top_k]
+    jobs = [{"source": None, "q_table_file": q_table_file, "seed": seed, "max_steps": max_steps,
+             "output": os.path.join(output_dir, f"seed{seed}_length{length}.gif")} for seed, length in best]
+    return export_episodes(jobs, processes)
+
+
+if __name__ == "__main__":
+    for output, n_frames in export_highlights():
+        print(f"{output}: {n_frames} frames")
@@ -0,0 +1,317 @@
+"""
+Snake Eater asyncio game host
+Hosts thousands of greedy games on one event loop instead of one SnakeGameEnv (and thread)
+per game. The host keeps every game in shared NumPy arrays, one row per session slot:
+    grid      occupancy of the board with a one-cell wall border (walls and body are both
+              "occupied", so a wall and a body hit are the same lookup)
+    ring      the body cells as a ring buffer (head at head_ptr, length cells)
+    direction, food, score, steps
+Each tick of the shared schedule encodes every game at once (get_state3 + encode_state3 with
+the tables of policy_server.py), makes one lookup in the greedy policy and moves every snake
+with array operations, following SnakeGameEnv.step (rewards, growth, the tail leaving before
+the collision test, a reverse action continuing straight). Finished games are reset.
+
+A session is a coroutine that joins the host and awaits the end of its episodes; it only runs
+when one of its games ends, so the per-tick cost does not depend on the Python objects of the
+sessions. Session uses __slots__ and holds no game state.
+"""
+import asyncio
+import time
+import tracemalloc
+import numpy as np
+from snake_env import SnakeGameEnv
+from q_learning import QLearning
+from policy_server import FOOD_INDEX, DANGER_CODE, OPPOSITE_SIDE, load_policy
+
+DIRECTIONS = ["UP", "DOWN", "LEFT", "RIGHT"]
+
+
+class Session:
+    __slots__ = ("slot", "episodes", "total_score", "best_score", "waiter")
+
+    def __init__(self, slot):
+        self.slot = slot
+        self.episodes = 0
+        self.total_score = 0
+        self.best_score = None
+        self.waiter = None  # Future of the coroutine waiting for the end of an episode
+
+
+class GameHost:
+    def __init__(self, capacity=4096, table_file="qtable_phase3.txt", tick=1 / 15, frame_size_x=150,
+                 frame_size_y=150, growing_body=True, max_steps=2000, seed=None):
+        """
+        capacity: maximum number of sessions; tick: seconds between ticks (0 runs as fast as
+        possible); max_steps: steps after which a game is ended as in training.evaluate
+        """
+        self.policy = load_policy(table_file)
+        self.tick = tick
+        self.growing_body = growing_body
+        self.max_steps = max_steps
+        self.rng = np.random.default_rng(seed)
+
+        self.width, self.height = frame_size_x // 10, frame_size_y // 10
+        self.row = self.width + 2  # Cells per grid row, border included
+        self.offsets = np.array([-self.row, self.row, -1, 1])  # Neighbour cell per direction / side
+        self.empty_grid = np.ones((self.height + 2, self.row), dtype=bool)
+        self.empty_grid[1:-1, 1:-1] = False
+        self.empty_grid = self.empty_grid.ravel()
+        self.start_body = np.array([self.cell(50, 50), self.cell(60, 50), self.cell(70, 50)])
+
+        self.grid = np.zeros((capacity, len(self.empty_grid)), dtype=bool)
+        self.ring = np.zeros((capacity, self.width * self.height), dtype=np.int16)
+        self.head_ptr = np.zeros(capacity, dtype=np.int32)
+        self.length = np.zeros(capacity, dtype=np.int32)
+        self.direction = np.zeros(capacity, dtype=np.int8)
+        self.food = np.zeros(capacity, dtype=np.int32)
+        self.score = np.zeros(capacity, dtype=np.int32)
+        self.steps = np.zeros(capacity, dtype=np.int32)
+        self.active = np.zeros(capacity, dtype=bool)
+
+        self.sessions = [None] * capacity
+        self.free = list(range(capacity - 1, -1, -1))
+        self.slots = np.zeros(0, dtype=np.int64)  # Active slots, rebuilt when sessions join or leave
+        self.changed = False
+        self.running = False
+        self.ticks = 0
+        self.late_ticks = 0  # Ticks that started after their scheduled time
+        self.game_steps = 0
+        self.busy = 0.0  # Seconds spent in step()
+        self.elapsed = 0.0  # Seconds spent in run(), sessions and event loop included
+
+    def cell(self, x, y):
+        """Grid index of a board position in pixels"""
+        return (y // 10 + 1) * self.row + x // 10 + 1
+
+    def position(self, cells):
+        """(x, y) in pixels of grid indices"""
+        cells = np.asarray(cells)
+        return np.stack(((cells % self.row - 1) * 10, (cells // self.row - 1) * 10), axis=-1)
+
+    # Sessions
+    def join(self):
+        if not self.free:
+            raise RuntimeError("The host is full")
+        session = Session(self.free.pop())
+        self.sessions[session.slot] = session
+        self.active[session.slot] = True
+        self.reset(np.array([session.slot]))
+        self.changed = True
+        return session
+
+    def leave(self, session):
+        self.active[session.slot] = False
+        self.sessions[session.slot] = None
+        self.free.append(session.slot)
+        self.changed = True
+
+    async def next_episode(self, session):
+        """Waits for the end of the current game of the session; returns (score, steps, length)"""
+        session.waiter = asyncio.get_running_loop().create_future()
+        return await session.waiter
+
+    # Games
+    def reset(self, slots):
+        self.grid[slots] = self.empty_grid
+        self.grid[slots[:, None], self.start_body] = True
+        self.ring[slots, :len(self.start_body)] = self.start_body
+        self.head_ptr[slots] = 0
+        self.length[slots] = len(self.start_body)
+        self.direction[slots] = DIRECTIONS.index("RIGHT")
+        self.score[slots] = 0
+        self.steps[slots] = 0
+        self.spawn_food(slots, border_chance=0.25)
+
+    def spawn_food(self, slots, border_chance=0.0):
+        """Random free cell for every slot; with border_chance on a random border, as SnakeGameEnv.reset"""
+        while len(slots):
+            x = self.rng.integers(0, self.width, len(slots))
+            y = self.rng.integers(0, self.height, len(slots))
+            border = np.where(self.rng.random(len(slots)) < border_chance, self.rng.integers(0, 4, len(slots)), -1)
+            y[border == 0] = 0
+            y[border == 1] = self.height - 1
+            x[border == 2] = 0
+            x[border == 3] = self.width - 1
+            cells = (y + 1) * self.row + x + 1
+            free = ~self.grid[slots, cells]
+            self.food[slots[free]] = cells[free]
+            slots = slots[~free]
+
+    def heads(self, slots):
+        return self.ring[slots, self.head_ptr[slots]].astype(np.int64)
+
+    def encode(self, slots):
+        """encode_state3(get_state3()) of the games in slots"""
+        heads, food, directions = self.heads(slots), self.food[slots], self.direction[slots]
+        dx = np.sign(food % self.row - heads % self.row)
+        dy = np.sign(food // self.row - heads // self.row)
+        bits = np.zeros(len(slots), dtype=np.int64)
+        for side, offset in enumerate(self.offsets):
+            danger = self.grid[slots, heads + offset] & (OPPOSITE_SIDE[directions] != side)
+            bits |= danger.astype(np.int64) << side
+        return FOOD_INDEX[dx + 1, dy + 1] * 40 + DANGER_CODE[directions, bits]
+
+    def step(self):
+        """Moves every active game with the greedy action of its state"""
+        begin = time.perf_counter()
+        if self.changed:
+            self.slots = np.flatnonzero(self.active)
+            self.changed = False
+        slots = self.slots
+        actions = self.policy[self.encode(slots)]
+
+        directions = self.direction[slots].astype(np.int64)
+        directions = np.where(actions == OPPOSITE_SIDE[directions], directions, actions)  # Reverse: straight on
+        heads = self.heads(slots)
+        new_heads = heads + self.offsets[directions]
+        food = self.food[slots]
+        eat = new_heads == food
+        grow = eat & self.growing_body
+
+        # The tail leaves before the collision test, as in SnakeGameEnv
+        tails = self.ring[slots, (self.head_ptr[slots] + self.length[slots] - 1) % self.ring.shape[1]]
+        self.grid[slots[~grow], tails[~grow]] = False
+        dead = self.grid[slots, new_heads]
+
+        distance = lambda cells: np.abs(food % self.row - cells % self.row) + np.abs(food // self.row - cells // self.row)
+        rewards = np.where(distance(new_heads) < distance(heads), 15, -15)
+        rewards[dead] = -75
+        rewards[eat] = 100
+
+        alive = slots[~dead]
+        self.head_ptr[alive] = (self.head_ptr[alive] - 1) % self.ring.shape[1]
+        self.ring[alive, self.head_ptr[alive]] = new_heads[~dead]
+        self.grid[alive, new_heads[~dead]] = True
+        self.length[slots] += grow
+        self.direction[slots] = directions
+        self.score[slots] += np.where(eat, 100, -1)
+        self.steps[slots] += 1
+        self.spawn_food(slots[eat])
+
+        finished = slots[dead | (self.steps[slots] >= self.max_steps)]
+        for slot, score, steps, length in zip(finished.tolist(), self.score[finished].tolist(),
+                                              self.steps[finished].tolist(), self.length[finished].tolist()):
+            session = self.sessions[slot]
+            session.episodes += 1
+            session.total_score += score
+            session.best_score = score if session.best_score is None else max(session.best_score, score)
+            if session.waiter is not None and not session.waiter.done():
+                session.waiter.set_result((score, steps, length))
+            session.waiter = None
+        self.reset(finished)
+
+        self.game_steps += len(slots)
+        self.busy += time.perf_counter() - begin
+        return rewards, dead
+
+    async def run(self, ticks=None):
+        """Ticks on the shared schedule until stop() or the given number of ticks"""
+        loop = asyncio.get_running_loop()
+        self.running = True
+        begin = next_tick = loop.time()
+        while self.running and (ticks is None or self.ticks < ticks):
+            if len(self.slots) or self.changed:
+                self.step()
+            self.ticks += 1
+            next_tick += self.tick
+            delay = next_tick - loop.time()
+            if delay < 0:
+                self.late_ticks += 1
+                next_tick = loop.time()  # Late ticks are not caught up
+            await asyncio.sleep(max(delay, 0))  # Lets the sessions run
+        self.elapsed += loop.time() - begin
+
+    def stop(self):
+        self.running = False
+
+    def game_env(self, slot):
+        """SnakeGameEnv with the current game of a slot (for checking and rendering)"""
+        env = SnakeGameEnv(self.width * 10, self.height * 10, self.growing_body, verbose=False)
+        cells = np.roll(self.ring[slot], -self.head_ptr[slot])[:self.length[slot]]
+        env.snake_body = self.position(cells).tolist()
+        env.snake_pos = list(env.snake_body[0])
+        env.food_pos = self.position(self.food[slot]).tolist()
+        env.direction = DIRECTIONS[self.direction[slot]]
+        return env
+
+
+async def play(host, n_episodes=None):
+    """Session playing n_episodes games on the host (forever if None); returns the session"""
+    session = host.join()
+    try:
+        while n_episodes is None or session.episodes < n_episodes:
+            await host.next_episode(session)
+    finally:
+        host.leave(session)
+    return session
+
+
+async def host_sessions(n_sessions, ticks, table_file="qtable_phase3.txt", n_episodes=None, seed=0):
+    """Runs n_sessions sessions for the given number of ticks (as fast as possible); returns the host"""
+    host = GameHost(n_sessions, table_file, tick=0, seed=seed)
+    tasks = [asyncio.create_task(play(host, n_episodes)) for _ in range(n_sessions)]
+    await asyncio.sleep(0)  # Every session joins
+    await host.run(ticks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return host
+
+
+def memory_per_session(n_sessions=4096):
+    """Bytes allocated per session (host arrays, Session and coroutine) and per SnakeGameEnv"""
+    async def start():
+        host = GameHost(n_sessions, tick=0)
+        tasks = [asyncio.create_task(play(host)) for _ in range(n_sessions)]
+        await asyncio.sleep(0)
+        host.step()
+        size = tracemalloc.get_traced_memory()[0]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return size
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    host_bytes = asyncio.run(start()) - base
+    base = tracemalloc.get_traced_memory()[0]
+    envs = [SnakeGameEnv(150, 150, seed=seed, verbose=False) for seed in range(n_sessions)]
+    env_bytes = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del envs
+    return host_bytes / n_sessions, env_bytes / n_sessions
+
+
+def env_loop(n_games, ticks, table_file="qtable_phase3.txt"):
+    """Steps per second of one SnakeGameEnv per game stepped in a Python loop (the baseline)"""
+    policy = load_policy(table_file)
+    envs = [SnakeGameEnv(150, 150, seed=seed, verbose=False) for seed in range(n_games)]
+    steps = [0] * n_games
+    begin = time.perf_counter()
+    for _ in range(ticks):
+        for i, env in enumerate(envs):
+            _, _, done = env.step(policy[QLearning.encode_state3(env.get_state3())])
+            steps[i] += 1
+            if done or steps[i] >= 2000:
+                env.reset()
+                steps[i] = 0
+    return n_games * ticks / (time.perf_counter() - begin)
+
+
+def benchmark(session_counts=(256, 1024, 4096, 16384), ticks=200, rate=15):
+    """Tick time and sessions per core at `rate` ticks per second (difficulty 15 in SnakeGame.main)"""
+    for n_sessions in session_counts:
+        host = asyncio.run(host_sessions(n_sessions, ticks))
+        tick_time = host.elapsed / host.ticks
+        print(f"{n_sessions} sessions: {tick_time * 1000:.2f} ms per tick ({host.busy / host.ticks * 1000:.2f} ms "
+              f"stepping), {host.game_steps / host.elapsed:.0f} steps/s, "
+              f"{n_sessions / (tick_time * rate):.0f} sessions per core at {rate} ticks/s")
+    steps_per_second = env_loop(256, ticks // 4)
+    print(f"SnakeGameEnv loop: {steps_per_second:.0f} steps/s, {steps_per_second / rate:.0f} sessions per core "
+          f"at {rate} ticks/s")
+    host_bytes, env_bytes = memory_per_session()
+    print(f"Memory per session: {host_bytes:.0f} bytes on the host, {env_bytes:.0f} bytes per SnakeGameEnv")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,181 @@
+"""
+Snake Eater Hogwild training
+Several worker processes play their own SnakeGameEnv and apply update_q_table directly to one
+Q-table in shared memory, without locks. Updates of different workers rarely touch the same
+entry at the same time, and a lost update on a 320 x 4 table is harmless.
+The coordinator collects the episode results, checkpoints the table and stops everyone once the
+greedy policy of the table reaches the target mean score.
+"""
+import multiprocessing as mp
+import queue
+import random
+import time
+from collections import deque
+import numpy as np
+from snake_env import SnakeGameEnv
+from q_learning import QLearning
+from shared_arrays import SharedArrays
+from training import run_episode, evaluate, target_mean_score
+
+N_STATES = 320
+N_ACTIONS = 4
+
+
+def hogwild_layout():
+    return {"q_table": (np.float64, (N_STATES, N_ACTIONS)), "stop": (np.int32, (1,))}
+
+
+def worker(worker_id, shm_name, seed, params, max_steps, results):
+    """Trains on the shared Q-table until the coordinator sets the stop flag"""
+    shared = SharedArrays(hogwild_layout(), shm_name)
+    random.seed(seed)
+    np.random.seed(seed)
+    env = SnakeGameEnv(150, 150, growing_body=True, seed=seed, verbose=False)
+    ql = QLearning(n_states=N_STATES, n_actions=N_ACTIONS, **params)
+    ql.q_table = shared["q_table"]  # Updates are written straight into shared memory
+
+    stop = shared["stop"]
+    while not stop[0]:
+        results.put((worker_id,) + run_episode(env, ql, training=True, max_steps=max_steps))
+
+    ql.q_table = None
+    del stop
+    shared.close()
+
+
+class Progress:
+    """
+    Keeps the scores of the last episodes and decides when the run is over.
+    The target is a greedy (epsilon = 0) mean score like target_mean_score, which the exploring
+    training episodes do not reach, so every eval_every episodes a copy of the table is played
+    greedily with training.evaluate (same seed every time) and that mean is compared with it.
+    """
+    def __init__(self, target_score, window, max_episodes, eval_every=100, eval_episodes=20, eval_seed=12345):
+        self.target_score = target_score
+        self.max_episodes = max_episodes
+        self.eval_every = eval_every
+        self.eval_episodes = eval_episodes
+        self.eval_seed = eval_seed
+        self.scores = deque(maxlen=window)
+        self.history = []
+        self.evaluations = []  # (episode, greedy mean score)
+        self.greedy_score = float("-inf")
+        self.episodes = 0
+
+    def add(self, score, total_reward, length, steps):
+        self.scores.append(score)
+        self.history.append((score, total_reward, length, steps))
+        self.episodes += 1
+
+    def evaluate(self, q_table):
+        """Greedy mean score of a copy of q_table, when an evaluation is due"""
+        if self.episodes % self.eval_every:
+            return
+        ql = QLearning(n_states=N_STATES, n_actions=N_ACTIONS, epsilon=0)
+        ql.q_table = np.array(q_table)  # Hogwild workers keep writing the shared one
+        self.greedy_score = evaluate(ql, self.eval_episodes, seed=self.eval_seed)
+        self.evaluations.append((self.episodes, self.greedy_score))
+
+    @property
+    def mean_score(self):
+        return float(np.mean(self.scores)) if self.scores else float("-inf")
+
+    @property
+    def reached(self):
+        return self.greedy_score >= self.target_score
+
+    @property
+    def done(self):
+        return self.reached or self.episodes >= self.max_episodes
+
+
+def train_sequential(target_score, window=100, max_episodes=20000, seed=0, params=None, max_steps=2000):
+    """Baseline: the single learner loop of SnakeGame.main, headless"""
+    random.seed(seed)
+    np.random.seed(seed)
+    env = SnakeGameEnv(150, 150, growing_body=True, seed=seed, verbose=False)
+    ql = QLearning(n_states=N_STATES, n_actions=N_ACTIONS, **(params or {}))
+    ql.q_table = np.zeros((N_STATES, N_ACTIONS))
+
+    progress = Progress(target_score, window, max_episodes)
+    begin = time.perf_counter()
+    while not progress.done:
+        progress.add(*run_episode(env, ql, training=True, max_steps=max_steps))
+        progress.evaluate(ql.q_table)
+    return {"elapsed": time.perf_counter() - begin, "episodes": progress.episodes,
+            "reached": progress.reached, "mean_score": progress.mean_score,
+            "greedy_score": progress.greedy_score, "history": progress.history, "q_table": ql.q_table}
+
+
+def train_hogwild(n_workers=None, target_score=None, window=100, max_episodes=20000, seed=0, params=None,
+                  max_steps=2000, checkpoint_file="qtable_hogwild.txt", checkpoint_every=1000):
+    """Runs n_workers lock-free learners on a shared Q-table. Returns the same summary as train_sequential"""
+    n_workers = n_workers or mp.cpu_count()
+    if target_score is None:
+        target_score = target_mean_score()
+
+    shared = SharedArrays(hogwild_layout())
+    shared["q_table"][:] = 0
+    shared["stop"][0] = 0
+    results = mp.Queue()
+    processes = [mp.Process(target=worker, daemon=True,
+                            args=(w, shared.name, seed + w, params or {}, max_steps, results))
+                 for w in range(n_workers)]
+
+    progress = Progress(target_score, window, max_episodes)
+    begin = time.perf_counter()
+    for p in processes:
+        p.start()
+
+    while not progress.done:
+        try:
+            worker_id, *episode = results.get(timeout=1)
+        except queue.Empty:
+            continue
+        progress.add(*episode)
+        progress.evaluate(shared["q_table"])
+        if checkpoint_file and progress.episodes % checkpoint_every == 0:
+            np.savetxt(checkpoint_file, shared["q_table"])
+            print(f"Episode {progress.episodes}: mean score of the last {window} = {progress.mean_score:.1f}, "
+                  f"greedy mean score = {progress.greedy_score:.1f}")
+    elapsed = time.perf_counter() - begin
+
+    shared["stop"][0] = 1
+    # Workers may be blocked putting their last result, so keep draining until they exit
+    while any(p.is_alive() for p in processes):
+        try:
+            results.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    for p in processes:
+        p.join()
+
+    q_table = shared["q_table"].copy()
+    if checkpoint_file:
+        np.savetxt(checkpoint_file, q_table)
+    shared.close()
+    return {"elapsed": elapsed, "episodes": progress.episodes, "reached": progress.reached,
+            "mean_score": progress.mean_score, "greedy_score": progress.greedy_score, "history": progress.history,
+            "q_table": q_table}
+
+
+def compare(n_workers=None, target_score=None, **kwargs):
+    """Wall-clock time to reach the target mean score, sequential loop versus Hogwild workers"""
+    if target_score is None:
+        target_score = target_mean_score()
+    sequential = train_sequential(target_score, **{k: v for k, v in kwargs.items()
+                                                   if k not in ("checkpoint_file", "checkpoint_every")})
+    parallel = train_hogwild(n_workers, target_score, **kwargs)
+    for name, run in (("Sequential", sequential), ("Hogwild", parallel)):
+        status = "reached" if run["reached"] else "not reached"
+        print(f"{name}: {run['episodes']} episodes in {run['elapsed']:.1f}s, "
+              f"greedy mean score {run['greedy_score']:.1f} (target {target_score:.1f} {status}), "
+              f"training mean score {run['mean_score']:.1f}")
+    if sequential["reached"] and parallel["reached"]:
+        print(f"Speedup: {sequential['elapsed'] / parallel['elapsed']:.2f}x")
+    return sequential, parallel
+
+
+if __name__ == "__main__":
+    # Best values after hyperparameter tuning (see q_learning.py)
+    compare(params={"alpha": 0.1, "gamma": 0.9, "epsilon": 0.05})
@@ -0,0 +1,124 @@
+"""
+Snake Eater successive halving / Hyperband tuner
+Starts many configurations with a small episode budget, ranks them by their recent mean reward
+and only keeps training the best 1/eta of them with eta times more episodes. Promoted trials
+resume from their checkpointed Q-table (saved with QLearning.save_q_table) instead of
+restarting. Trials of a rung are trained in parallel processes.
+"""
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from snake_env import SnakeGameEnv
+from q_learning import QLearning
+from training import run_episode
+
+N_STATES = 320
+N_ACTIONS = 4
+
+
+def sample_configs(n, seed=0, first_id=0):
+    """Random configurations around the values explored in hyp1/ and hyp2/"""
+    rng = np.random.default_rng(seed)
+    configs = []
+    for i in range(n):
+        configs.append({"trial": first_id + i,
+                        "alpha": round(float(rng.uniform(0.05, 0.7)), 3),
+                        "gamma": round(float(rng.uniform(0.3, 0.99)), 3),
+                        "epsilon": float(rng.choice([0.05, 0.2, 1.0])),
+                        "epsilon_decay": float(rng.choice([0.99, 0.995, 0.999, 1.0])),
+                        "seed": seed * 100000 + first_id + i,
+                        "episodes_done": 0,
+                        "rewards": []})
+    return configs
+
+
+def checkpoint_file(checkpoint_dir, trial):
+    return os.path.join(checkpoint_dir, f"trial_{trial['trial']}.txt")
+
+
+def train_trial(trial, budget, checkpoint_dir, max_steps=2000):
+    """
+    Trains a trial until it has played `budget` episodes in total, starting from its checkpoint once
+    it has one (the first rung starts from zeros, even if an older run left a file with the same
+    trial id). Returns (trial id, new rewards, epsilon).
+    """
+    seed = trial["seed"] + trial["episodes_done"]
+    random.seed(seed)
+    np.random.seed(seed)
+    env = SnakeGameEnv(150, 150, growing_body=True, seed=seed, verbose=False)
+    ql = QLearning(n_states=N_STATES, n_actions=N_ACTIONS, alpha=trial["alpha"], gamma=trial["gamma"],
+                   epsilon=trial["epsilon"], epsilon_decay=trial["epsilon_decay"])
+    filename = checkpoint_file(checkpoint_dir, trial)
+    if trial["episodes_done"] > 0:
+        ql.load_q_table(filename)
+    else:
+        ql.q_table = np.zeros((N_STATES, N_ACTIONS))
+
+    rewards = [run_episode(env, ql, training=True, max_steps=max_steps)[1]
+               for _ in range(budget - trial["episodes_done"])]
+    ql.save_q_table(filename)
+    return trial["trial"], rewards, ql.epsilon
+
+
+def recent_mean(trial, window):
+    return float(np.mean(trial["rewards"][-window:])) if trial["rewards"] else float("-inf")
+
+
+def successive_halving(trials, min_episodes, max_episodes, eta=3, pool=None, checkpoint_dir="hyperband",
+                       window=50, max_steps=2000):
+    """
+    Rung i trains the surviving trials up to min_episodes * eta**i episodes and keeps the best
+    len / eta of them by mean reward over their last `window` episodes. Returns the trials ranked.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    budget = min_episodes
+    while True:
+        futures = [pool.submit(train_trial, trial, budget, checkpoint_dir, max_steps) for trial in trials]
+        by_id = {trial["trial"]: trial for trial in trials}
+        for future in futures:
+            trial_id, rewards, epsilon = future.result()
+            trial = by_id[trial_id]
+            trial["rewards"].extend(rewards)
+            trial["episodes_done"] = budget
+            trial["epsilon"] = epsilon
+
+        trials.sort(key=lambda trial: recent_mean(trial, window), reverse=True)
+        print(f"  Rung with {budget} episodes: {len(trials)} trials, best recent mean reward "
+              f"{recent_mean(trials[0], window):.1f} (trial {trials[0]['trial']})")
+        if budget >= max_episodes or len(trials) == 1:
+            return trials
+        trials = trials[:max(1, len(trials) // eta)]
+        budget = min(budget * eta, max_episodes)
+
+
+def hyperband(max_episodes=500, eta=3, min_episodes=20, seed=0, processes=None, checkpoint_dir="hyperband",
+              window=50, max_steps=2000):
+    """
+    Runs one successive halving bracket per trade-off between the number of configurations and
+    their starting budget, and returns the best trial over all brackets.
+    """
+    s_max = int(math.log(max_episodes / min_episodes, eta) + 1e-9)
+    best = []
+    next_id = 0
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for s in range(s_max, -1, -1):
+            n = int(math.ceil((s_max + 1) / (s + 1) * eta ** s))
+            start = max(min_episodes, int(max_episodes * eta ** -s))
+            print(f"Bracket s={s}: {n} configurations starting with {start} episodes")
+            trials = sample_configs(n, seed + s, next_id)
+            next_id += n
+            ranked = successive_halving(trials, start, max_episodes, eta, pool, checkpoint_dir, window, max_steps)
+            best.append(ranked[0])
+
+    best.sort(key=lambda trial: recent_mean(trial, window), reverse=True)
+    winner = best[0]
+    print(f"Best: trial {winner['trial']} alpha={winner['alpha']} gamma={winner['gamma']} "
+          f"epsilon_decay={winner['epsilon_decay']} recent mean reward {recent_mean(winner, window):.1f}, "
+          f"Q-table in {checkpoint_file(checkpoint_dir, winner)}")
+    return winner
+
+
+if __name__ == "__main__":
+    hyperband()
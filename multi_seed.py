@@ -0,0 +1,121 @@
+"""
+Snake Eater multi-seed training
+Trains many independent learners at once: BatchedQLearning keeps one Q-table per seed in a
+(seeds, n_states, n_actions) array and the vector environment runs one game per seed, so every
+step of every learner is done by the same vectorized NumPy operations. At the end, per-seed
+learning curves are summarized with a mean and a 95% confidence band.
+"""
+import time
+import numpy as np
+from q_learning import QLearning
+from vector_env import SubprocVectorEnv
+
+
+class BatchedQLearning(QLearning):
+    def __init__(self, n_seeds, n_states, n_actions, alpha=0.2, gamma=0.8, epsilon=0.05, epsilon_min=0,
+                 epsilon_decay=1, seed=0):
+        super().__init__(n_states, n_actions, alpha, gamma, epsilon, epsilon_min, epsilon_decay)
+        self.n_seeds = n_seeds
+        self.lanes = np.arange(n_seeds)
+        self.rng = np.random.default_rng(seed)
+        self.q_table = np.zeros((n_seeds, n_states, n_actions))
+
+    def choose_actions(self, states):
+        """Epsilon-greedy action for every seed, states being one encoded state per seed"""
+        greedy = np.argmax(self.q_table[self.lanes, states], axis=1)
+        explore = self.rng.random(self.n_seeds) < self.epsilon
+        actions = np.where(explore, self.rng.integers(0, self.n_actions, self.n_seeds), greedy)
+        self.epsilon = max(self.epsilon_min, self.epsilon_decay * self.epsilon)
+        return actions
+
+    def update_q_values(self, states, actions, rewards, next_states):
+        """Same update as update_q_value, for one transition per seed"""
+        current_q = self.q_table[self.lanes, states, actions]
+        # Terminal state if snake dies
+        terminal = rewards == -75
+        future = np.where(terminal, 0.0, self.gamma * np.max(self.q_table[self.lanes, next_states], axis=1))
+        self.q_table[self.lanes, states, actions] = (1 - self.alpha) * current_q + self.alpha * (rewards + future)
+
+    def save_q_table(self, filename="qtable_seeds.npy"):
+        np.save(filename, self.q_table)
+
+
+def confidence_band(curves, z=1.96):
+    """Mean and normal-approximation confidence band over seeds of a (seeds, episodes) array"""
+    mean = curves.mean(axis=0)
+    half_width = z * curves.std(axis=0, ddof=1) / np.sqrt(len(curves))
+    return mean, mean - half_width, mean + half_width
+
+
+def train_seeds(n_seeds=32, episodes=500, n_workers=None, seed=0, alpha=0.1, gamma=0.9, epsilon=1.0,
+                epsilon_decay=0.995, max_episode_steps=2000, results_file="multi_seed_results.npz"):
+    """
+    Trains n_seeds learners until each one has played `episodes` episodes.
+    Returns a dict with the (seeds, episodes) reward, score and length curves and their bands.
+    """
+    ql = BatchedQLearning(n_seeds, 320, 4, alpha=alpha, gamma=gamma, epsilon=epsilon,
+                          epsilon_decay=epsilon_decay, seed=seed)
+    rewards_per_seed = np.zeros((n_seeds, episodes))
+    scores_per_seed = np.zeros((n_seeds, episodes))
+    lengths_per_seed = np.zeros((n_seeds, episodes))
+    finished = np.zeros(n_seeds, dtype=int)
+
+    begin = time.perf_counter()
+    total_steps = 0
+    with SubprocVectorEnv(n_seeds, n_workers, seed=seed, max_episode_steps=max_episode_steps) as venv:
+        states = venv.reset().astype(np.int64)
+        while finished.min() < episodes:
+            actions = ql.choose_actions(states)
+            next_states, rewards, dones = venv.step(actions)
+            next_states = next_states.astype(np.int64)
+            # Finished lanes are already reset: a truncated episode bootstraps from its last state,
+            # not from the first state of the next game (deaths do not bootstrap)
+            targets = np.where(dones, venv.final_states, next_states)
+            ql.update_q_values(states, actions, rewards, targets)
+            states = next_states
+            total_steps += n_seeds
+
+            for lane in np.flatnonzero(dones):
+                if finished[lane] < episodes:
+                    # Score as in SnakeGame.main: +100 per apple, -1 for every other step
+                    apples = venv.episode_lengths[lane] - 3
+                    rewards_per_seed[lane, finished[lane]] = venv.episode_rewards[lane]
+                    scores_per_seed[lane, finished[lane]] = 100 * apples - (venv.episode_steps[lane] - apples)
+                    lengths_per_seed[lane, finished[lane]] = venv.episode_lengths[lane]
+                    finished[lane] += 1
+    elapsed = time.perf_counter() - begin
+
+    results = {"rewards": rewards_per_seed, "scores": scores_per_seed, "lengths": lengths_per_seed}
+    for key in list(results):
+        results[key + "_mean"], results[key + "_low"], results[key + "_high"] = confidence_band(results[key])
+    if results_file:
+        np.savez(results_file, **results)
+    print(f"{n_seeds} seeds x {episodes} episodes: {total_steps} steps in {elapsed:.1f}s "
+          f"({total_steps / elapsed:.0f} steps/s)")
+    return results, ql
+
+
+def plot_band(results, key="rewards", group_size=10):
+    """Mean learning curve with its confidence band, averaged in groups of episodes like analysis.py"""
+    import matplotlib.pyplot as plt
+
+    curves = results[key]
+    n_groups = curves.shape[1] // group_size
+    grouped = curves[:, :n_groups * group_size].reshape(len(curves), n_groups, group_size).mean(axis=2)
+    mean, low, high = confidence_band(grouped)
+    x_values = np.arange(1, n_groups + 1) * group_size
+
+    plt.figure(figsize=(8, 6))
+    plt.plot(x_values, mean, color="blue", label=f"Mean over {len(curves)} seeds")
+    plt.fill_between(x_values, low, high, color="blue", alpha=0.2, label="95% confidence band")
+    plt.xlabel(f"Episode (Grouped every {group_size} episodes)")
+    plt.ylabel(f"Mean {key}")
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    plt.show()
+
+
+if __name__ == "__main__":
+    results, ql = train_seeds()
+    plot_band(results)
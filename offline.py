@@ -0,0 +1,211 @@
+"""
+Snake Eater offline fitted Q-iteration
+Learns a phase 3 Q-table from logged transitions only, without simulating new games.
+
+Transition datasets are directories with one raw typed-array file per column, appended to
+by TransitionWriter and memory-mapped by TransitionDataset, so millions of transitions are
+read straight from disk:
+    states.bin       int16    encode_state3 of the state
+    actions.bin      int8     action taken (0 up, 1 down, 2 left, 3 right)
+    rewards.bin      float32  reward of the step
+    next_states.bin  int16    encode_state3 of the next state
+    dones.bin        uint8    1 if the snake died (no bootstrap)
+    meta.json        number of states and actions
+
+Transitions are logged by playing an existing table: a phase 3 table (320 rows) acts on
+encode_state3, the phase 2 table (28 rows, phase_2/qtable_phase2.txt) acts on its own
+(border, food_state) features; both are stored in the phase 3 encoding.
+
+fitted_q_iteration then repeats Q(s, a) <- mean over the logged (s, a) of r + gamma * max Q(s')
+over the whole dataset, each sweep vectorized with np.bincount.
+"""
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from snake_env import SnakeGameEnv
+from q_learning import QLearning
+from training import evaluate
+from phase_2.snake_env2 import SnakeGameEnv as SnakeGameEnv2
+from phase_2.q_learning2 import QLearning as QLearning2
+
+N_STATES = 320
+N_ACTIONS = 4
+COLUMNS = {"states": np.int16, "actions": np.int8, "rewards": np.float32, "next_states": np.int16,
+           "dones": np.uint8}
+
+
+class TransitionWriter:
+    """Appends transitions to a dataset directory (created if needed)"""
+    def __init__(self, path, n_states=N_STATES, n_actions=N_ACTIONS):
+        os.makedirs(path, exist_ok=True)
+        meta_file = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_file):
+            with open(meta_file, "w") as f:
+                json.dump({"n_states": n_states, "n_actions": n_actions,
+                           "columns": {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()}}, f)
+        self.files = {name: open(os.path.join(path, f"{name}.bin"), "ab") for name in COLUMNS}
+
+    def append(self, states, actions, rewards, next_states, dones):
+        columns = {"states": states, "actions": actions, "rewards": rewards, "next_states": next_states,
+                   "dones": dones}
+        for name, dtype in COLUMNS.items():
+            np.asarray(columns[name], dtype=dtype).tofile(self.files[name])
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TransitionDataset:
+    """Read-only memory-mapped view of a dataset directory"""
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.n_states = meta["n_states"]
+        self.n_actions = meta["n_actions"]
+        for name, dtype in COLUMNS.items():
+            filename = os.path.join(path, f"{name}.bin")
+            if os.path.getsize(filename) == 0:
+                column = np.zeros(0, dtype=dtype)  # np.memmap cannot map an empty file
+            else:
+                column = np.memmap(filename, dtype=dtype, mode="r")
+            setattr(self, name, column)
+        self.size = min(len(getattr(self, name)) for name in COLUMNS)  # Ignore a partly written last row
+
+    def __len__(self):
+        return self.size
+
+    def chunks(self, chunk_size=1 << 20):
+        """Yields (states, actions, rewards, next_states, dones) slices of at most chunk_size rows"""
+        for start in range(0, self.size, chunk_size):
+            end = min(start + chunk_size, self.size)
+            yield tuple(getattr(self, name)[start:end] for name in COLUMNS)
+
+
+def phase2_encoder(env):
+    """encode_state of phase 2 applied to the (border, food_state) features of a phase 3 game"""
+    # Both methods only read the snake, the food and the frame size, which the phase 3 game shares
+    return QLearning2.encode_state(SnakeGameEnv2.get_state(env))
+
+
+def log_episodes(table_file, n_episodes, epsilon=0.1, seed=0, max_steps=2000):
+    """
+    Plays n_episodes epsilon-greedy games with the table in table_file and returns its transitions
+    as a tuple of column arrays. Games cut at max_steps are logged without a terminal flag.
+    """
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    q_table = np.loadtxt(table_file)
+    phase2 = len(q_table) != N_STATES
+    env = SnakeGameEnv(150, 150, growing_body=True, seed=seed, verbose=False)
+
+    states, actions, rewards, next_states, dones = [], [], [], [], []
+    for _ in range(n_episodes):
+        state = QLearning.encode_state3(env.reset())
+        for _ in range(max_steps):
+            if rng.uniform() < epsilon:
+                action = int(rng.integers(N_ACTIONS))  # Explore
+            else:
+                action = int(np.argmax(q_table[phase2_encoder(env) if phase2 else state]))
+            next_state, reward, game_over = env.step(action)
+            next_state = QLearning.encode_state3(next_state)
+            states.append(state)
+            actions.append(action)
+            rewards.append(reward)
+            next_states.append(next_state)
+            dones.append(reward == -75)
+            state = next_state
+            if game_over:
+                break
+
+    return (np.array(states, dtype=np.int16), np.array(actions, dtype=np.int8),
+            np.array(rewards, dtype=np.float32), np.array(next_states, dtype=np.int16),
+            np.array(dones, dtype=np.uint8))
+
+
+def collect(path, table_file="qtable_phase3.txt", n_episodes=1000, epsilon=0.1, seed=0, n_workers=None,
+            max_steps=2000):
+    """Logs n_episodes games of table_file into the dataset at path, split over worker processes"""
+    n_workers = n_workers or os.cpu_count()
+    shares = [n_episodes // n_workers + (i < n_episodes % n_workers) for i in range(n_workers)]
+    with ProcessPoolExecutor(n_workers) as pool, TransitionWriter(path) as writer:
+        futures = [pool.submit(log_episodes, table_file, share, epsilon, seed * 1000 + i, max_steps)
+                   for i, share in enumerate(shares) if share]
+        for future in futures:
+            writer.append(*future.result())
+    return TransitionDataset(path)
+
+
+def fitted_q_iteration(dataset, gamma=0.9, max_iterations=500, tol=1e-4, q_init=None, chunk_size=1 << 20,
+                       unseen_value=-75.0):
+    """
+    Fitted Q-iteration with a tabular regressor: every iteration sets each logged (s, a) to the
+    mean of its Bellman targets r + gamma * (1 - done) * max_a' Q(s', a') over the whole dataset.
+    Pairs that never appear in the dataset are given unseen_value (a death, as in value_iteration),
+    so the max never picks an untried action over the logged ones; with unseen_value=None they
+    keep their value of q_init (zeros by default).
+    Returns (Q-table, iterations run, last maximum change).
+    """
+    n_states, n_actions = dataset.n_states, dataset.n_actions
+    q_table = np.zeros((n_states, n_actions)) if q_init is None else np.array(q_init, dtype=np.float64)
+
+    # Constant parts of the targets: visits and reward sums of every (s, a)
+    counts = np.zeros(n_states * n_actions)
+    reward_sums = np.zeros(n_states * n_actions)
+    for states, actions, rewards, _, _ in dataset.chunks(chunk_size):
+        index = states.astype(np.int64) * n_actions + actions
+        counts += np.bincount(index, minlength=n_states * n_actions)
+        reward_sums += np.bincount(index, weights=rewards, minlength=n_states * n_actions)
+    seen = counts > 0
+    if unseen_value is not None:
+        q_table.reshape(-1)[~seen] = unseen_value
+
+    change = np.inf
+    for iteration in range(1, max_iterations + 1):
+        values = np.max(q_table, axis=1)
+        future = np.zeros(n_states * n_actions)
+        for states, actions, _, next_states, dones in dataset.chunks(chunk_size):
+            index = states.astype(np.int64) * n_actions + actions
+            future += np.bincount(index, weights=values[next_states] * (1 - dones),
+                                  minlength=n_states * n_actions)
+        new_q = q_table.reshape(-1).copy()
+        new_q[seen] = (reward_sums[seen] + gamma * future[seen]) / counts[seen]
+        change = np.max(np.abs(new_q - q_table.reshape(-1)))
+        q_table = new_q.reshape(n_states, n_actions)
+        if change < tol:
+            break
+    return q_table, iteration, change
+
+
+def main(path="transitions", sources=("qtable_phase3.txt", "phase_2/qtable_phase2.txt"), n_episodes=500,
+         epsilon=0.1, gamma=0.9, output="qtable_offline.txt"):
+    """Logs games of the existing tables, fits a table offline and compares the greedy scores"""
+    for i, source in enumerate(sources):
+        start = time.perf_counter()
+        collect(path, source, n_episodes, epsilon, seed=i)
+        print(f"Logged {n_episodes} games of {source} in {time.perf_counter() - start:.1f} s")
+    dataset = TransitionDataset(path)
+
+    start = time.perf_counter()
+    q_table, iterations, change = fitted_q_iteration(dataset, gamma)
+    elapsed = time.perf_counter() - start
+    print(f"{len(dataset)} transitions: {iterations} sweeps in {elapsed:.2f} s (last change {change:.2e})")
+    np.savetxt(output, q_table)
+
+    for name, table in (("phase 3 table", np.loadtxt(sources[0])), ("offline table", q_table)):
+        ql = QLearning(n_states=N_STATES, n_actions=N_ACTIONS, epsilon=0)
+        ql.q_table = table
+        print(f"{name}: greedy mean score {evaluate(ql, 50, seed=12345):.1f}")
+
+
+if __name__ == "__main__":
+    main()
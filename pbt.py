@@ -0,0 +1,121 @@
+"""
+Snake Eater population-based training
+N learners train in parallel processes, each with its own alpha, gamma and epsilon. After every
+generation (a fixed number of episodes) a member in the bottom fraction of the population copies
+the Q-table and hyperparameters of a member in the top fraction and perturbs the hyperparameters.
+Q-tables, hyperparameters and scores live in shared memory; every generation and every copy is
+written to a lineage log for later analysis.
+
+Members copy each other's tables without locks, like the Hogwild trainer: a copy may mix a few
+entries from consecutive updates of the source, which does not matter for the result.
+"""
+import multiprocessing as mp
+import random
+import numpy as np
+from snake_env import SnakeGameEnv
+from q_learning import QLearning
+from shared_arrays import SharedArrays
+from training import run_episode
+
+N_STATES = 320
+N_ACTIONS = 4
+ALPHA, GAMMA, EPSILON = 0, 1, 2  # Columns of the shared "params" array
+
+
+def pbt_layout(n_members):
+    return {"q_tables": (np.float64, (n_members, N_STATES, N_ACTIONS)),
+            "params": (np.float64, (n_members, 3)),
+            "scores": (np.float64, (n_members,))}
+
+
+def perturb(params, rng, factors=(0.8, 1.2)):
+    """Explore step: multiplies every hyperparameter by a random factor, keeping them valid"""
+    alpha, gamma, epsilon = params * rng.choice(factors, size=3)
+    return np.array([min(alpha, 1.0), min(gamma, 0.999), min(epsilon, 1.0)])
+
+
+def member(i, shm_name, n_members, generations, interval, truncation, seed, events, max_steps):
+    """Trains member i for the given number of generations, exploiting/exploring between them"""
+    shared = SharedArrays(pbt_layout(n_members), shm_name)
+    q_tables, params, scores = shared["q_tables"], shared["params"], shared["scores"]
+    random.seed(seed)
+    np.random.seed(seed)
+    rng = np.random.default_rng(seed)
+    env = SnakeGameEnv(150, 150, growing_body=True, seed=seed, verbose=False)
+    ql = QLearning(n_states=N_STATES, n_actions=N_ACTIONS)
+    ql.q_table = q_tables[i]
+
+    for generation in range(generations):
+        ql.alpha, ql.gamma, ql.epsilon = params[i]
+        rewards = [run_episode(env, ql, training=True, max_steps=max_steps)[1] for _ in range(interval)]
+        scores[i] = np.mean(rewards)
+        events.put(("generation", generation, i, scores[i], *params[i]))
+
+        # Exploit: the bottom members copy a random top member, then explore around its hyperparameters
+        ready = np.flatnonzero(np.isfinite(scores))
+        if len(ready) < 2:
+            continue
+        ranked = ready[np.argsort(scores[ready])]
+        cut = max(1, int(len(ranked) * truncation))
+        if i in ranked[:cut]:
+            source = int(rng.choice(ranked[-cut:]))
+            q_tables[i][:] = q_tables[source]
+            params[i] = perturb(params[source].copy(), rng)
+            events.put(("exploit", generation, i, source, *params[i]))
+
+    events.put(("finished", i))
+    ql.q_table = None
+    del q_tables, params, scores
+    shared.close()
+
+
+def train_pbt(n_members=8, generations=20, interval=25, truncation=0.25, seed=0,
+              lineage_file="pbt_lineage.txt", save_file="qtable_pbt.txt", max_steps=2000):
+    """Runs the population and returns (best member, its score, its hyperparameters)"""
+    shared = SharedArrays(pbt_layout(n_members))
+    rng = np.random.default_rng(seed)
+    shared["q_tables"][:] = 0
+    shared["params"][:, ALPHA] = rng.uniform(0.05, 0.5, n_members)
+    shared["params"][:, GAMMA] = rng.uniform(0.5, 0.99, n_members)
+    shared["params"][:, EPSILON] = rng.uniform(0.0, 0.2, n_members)
+    shared["scores"][:] = -np.inf
+
+    events = mp.Queue()
+    processes = [mp.Process(target=member, daemon=True,
+                            args=(i, shared.name, n_members, generations, interval, truncation,
+                                  seed * 1000 + i, events, max_steps))
+                 for i in range(n_members)]
+    for p in processes:
+        p.start()
+
+    # Lineage log: one line per finished generation and per copy (Parent is the member copied from)
+    finished = 0
+    with open(lineage_file, "w") as f:
+        f.write("Event\tGeneration\tMember\tParent\tScore\tAlpha\tGamma\tEpsilon\n")
+        while finished < n_members:
+            event = events.get()
+            if event[0] == "finished":
+                finished += 1
+            elif event[0] == "generation":
+                _, generation, i, score, alpha, gamma, epsilon = event
+                f.write(f"generation\t{generation}\t{i}\t{i}\t{score}\t{alpha}\t{gamma}\t{epsilon}\n")
+                print(f"Generation {generation}, member {i}: mean reward {score:.1f} "
+                      f"(alpha={alpha:.3f}, gamma={gamma:.3f}, epsilon={epsilon:.3f})")
+            else:
+                _, generation, i, source, alpha, gamma, epsilon = event
+                f.write(f"exploit\t{generation}\t{i}\t{source}\tnan\t{alpha}\t{gamma}\t{epsilon}\n")
+    for p in processes:
+        p.join()
+
+    best = int(np.argmax(shared["scores"]))
+    result = (best, float(shared["scores"][best]), shared["params"][best].copy())
+    if save_file:
+        np.savetxt(save_file, shared["q_tables"][best])
+    shared.close()
+    print(f"Best member {best}: mean reward {result[1]:.1f}, alpha={result[2][ALPHA]:.3f}, "
+          f"gamma={result[2][GAMMA]:.3f}, epsilon={result[2][EPSILON]:.3f}")
+    return result
+
+
+if __name__ == "__main__":
+    train_pbt()
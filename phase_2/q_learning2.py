@@ -39,7 +39,8 @@ class QLearning:
             f.write(f"{episode_number}\t{self.alpha}\t{self.gamma}\t{self.epsilon}\t{total_reward}\n")
 
 
-    def encode_state(self, state):
+    @staticmethod
+    def encode_state(state):
         """Encode state to obtain an integer"""
         border, food_state = state
 
@@ -0,0 +1,295 @@
+"""
+Snake Eater policy server
+Serves the greedy policy of a trained table to other local processes (bots, dashboards), so
+they do not need the table or the state encoder. A client sends the raw game (direction, food
+and body cells) and gets the action back.
+
+Protocol (Unix socket or TCP), little endian, any number of requests in flight per connection:
+    request:  direction (uint8, 0 up 1 down 2 left 3 right), food x, food y (int16),
+              number of body blocks (uint16), then x, y (int16) of every block, head first
+    response: the action (uint8), in the order of the requests
+Answers wait in a per-connection output buffer when the client does not read them yet, and are
+sent as the socket becomes writable, so a client may pipeline as many requests as it likes.
+
+The server micro-batches: every request already received from any connection when the server
+is ready (up to max_batch, optionally waiting up to max_delay seconds for more) goes through
+encode_batch (get_state3 + encode_state3 computed with NumPy on an occupancy grid and the
+PHASE3 code tables) and one policy lookup. load_test plays games driven by the server from
+client processes and reports the latency percentiles and the throughput.
+"""
+import multiprocessing as mp
+import os
+import selectors
+import socket
+import struct
+import time
+import numpy as np
+from snake_env import SnakeGameEnv
+from actor_learner import make_socket, recv_exactly
+from state_spec import PHASE3
+import quantize
+
+REQUEST = struct.Struct("<BhhH")
+BLOCK = np.dtype("<i2")
+DIRECTIONS = ["UP", "DOWN", "LEFT", "RIGHT"]
+STEPS = np.array([(0, -10), (0, 10), (-10, 0), (10, 0)])  # Neighbour cell of the head per side
+OPPOSITE_SIDE = np.array([1, 0, 3, 2])  # Side behind the head for each direction
+
+
+# Digits of the PHASE3 features from their integer codes (see state_spec.py):
+# FOOD_INDEX[sign(dx) + 1, sign(dy) + 1] and DANGER_CODE[direction, danger bits (top 1, bottom 2, left 4, right 8)]
+FOOD_INDEX = PHASE3.code_tables[0].reshape(3, 3)
+DANGER_CODE = PHASE3.code_tables[1].reshape(4, 16)
+
+
+def encode_batch(directions, food, blocks, lengths, frame_size_x=150, frame_size_y=150):
+    """
+    encode_state3(get_state3()) of N games at once.
+    directions (N,), food (N, 2), blocks (sum of lengths, 2) with the bodies one after the other
+    (head first) and lengths (N,) the number of blocks of each body.
+    """
+    n = len(directions)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    heads = blocks[starts]
+
+    delta = np.sign(food - heads)
+    food_index = FOOD_INDEX[delta[:, 0] + 1, delta[:, 1] + 1]
+
+    # Occupancy grid of every game, then the four neighbours of each head
+    width, height = frame_size_x // 10, frame_size_y // 10
+    grid = np.zeros((n, height + 2, width + 2), dtype=bool)  # One cell of margin outside the board
+    owner = np.repeat(np.arange(n), lengths)
+    cells = blocks // 10 + 1
+    inside = (cells[:, 0] >= 0) & (cells[:, 0] < width + 2) & (cells[:, 1] >= 0) & (cells[:, 1] < height + 2)
+    grid[owner[inside], cells[inside, 1], cells[inside, 0]] = True
+
+    bits = np.zeros(n, dtype=np.int64)
+    for side, (step_x, step_y) in enumerate(STEPS):
+        x, y = heads[:, 0] + step_x, heads[:, 1] + step_y
+        wall = (x < 0) | (x >= frame_size_x) | (y < 0) | (y >= frame_size_y)
+        cx, cy = np.clip(x // 10 + 1, 0, width + 1), np.clip(y // 10 + 1, 0, height + 1)
+        danger = (wall | grid[np.arange(n), cy, cx]) & (OPPOSITE_SIDE[directions] != side)
+        bits |= danger.astype(np.int64) << side
+    return food_index * 40 + DANGER_CODE[directions, bits]
+
+
+def load_policy(filename="qtable_phase3.txt"):
+    """Greedy action of every state from a text Q-table or a table exported by quantize.py"""
+    if filename.endswith(".npy"):
+        return np.asarray(quantize.actions_of(quantize.load(filename)), dtype=np.uint8)
+    return np.argmax(np.loadtxt(filename), axis=1).astype(np.uint8)
+
+
+def pack_request(direction, food, body):
+    return REQUEST.pack(direction, food[0], food[1], len(body)) + np.asarray(body, dtype=BLOCK).tobytes()
+
+
+class PolicyServer:
+    def __init__(self, address, table_file="qtable_phase3.txt", max_batch=256, max_delay=0.0,
+                 frame_size_x=150, frame_size_y=150):
+        self.policy = load_policy(table_file)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.frame_size = (frame_size_x, frame_size_y)
+        self.batches = []  # Size of every batch served
+
+        self.address = address
+        if isinstance(address, str) and os.path.exists(address):
+            os.unlink(address)
+        self.listener = make_socket(address)
+        if not isinstance(address, str):
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(address)
+        self.listener.listen(128)
+        self.address = self.listener.getsockname()
+
+    def parse(self, conn, buffer, pending):
+        """
+        Moves the complete requests at the start of buffer to pending. Returns False on a request
+        with an unknown direction, no body or body blocks outside the board, so that the connection
+        is closed before the request reaches encode_batch.
+        """
+        offset = 0
+        while len(buffer) - offset >= REQUEST.size:
+            direction, food_x, food_y, length = REQUEST.unpack_from(buffer, offset)
+            if direction >= len(DIRECTIONS) or length == 0:
+                return False
+            end = offset + REQUEST.size + 4 * length
+            if len(buffer) < end:
+                break
+            body = np.frombuffer(buffer[offset + REQUEST.size:end], dtype=BLOCK).reshape(length, 2)  # A copy
+            if np.any(body < 0) or np.any(body >= self.frame_size):
+                return False
+            pending.append((conn, direction, food_x, food_y, body))
+            offset = end
+        del buffer[:offset]
+        return True
+
+    def flush(self, pending):
+        directions = np.array([p[1] for p in pending], dtype=np.int64)
+        food = np.array([(p[2], p[3]) for p in pending], dtype=np.int64)
+        blocks = np.concatenate([p[4] for p in pending]).astype(np.int64)
+        lengths = np.array([len(p[4]) for p in pending])
+        actions = self.policy[encode_batch(directions, food, blocks, lengths, *self.frame_size)]
+
+        # The answers go to the output buffer of each connection, in the order of its requests
+        for (conn, *_), action in zip(pending, actions.tolist()):
+            if conn in self.outgoing:
+                self.outgoing[conn].append(action)
+        for conn in dict.fromkeys(p[0] for p in pending):
+            if conn in self.outgoing:
+                self.send(conn)
+        self.batches.append(len(pending))
+
+    def send(self, conn):
+        """
+        Sends what the socket takes of the output buffer of conn; while something is left (the
+        client has many requests in flight and does not read yet) the rest goes on EVENT_WRITE
+        """
+        out = self.outgoing[conn]
+        try:
+            sent = conn.send(out) if out else 0
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            self.close_connection(conn)
+            return
+        del out[:sent]
+        if bool(out) != (conn in self.writing):
+            self.writing.symmetric_difference_update((conn,))
+            self.selector.modify(conn, selectors.EVENT_READ | (selectors.EVENT_WRITE if out else 0))
+
+    def close_connection(self, conn):
+        self.selector.unregister(conn)
+        del self.buffers[conn]
+        del self.outgoing[conn]
+        self.writing.discard(conn)
+        conn.close()
+
+    def serve(self, duration=None):
+        """Serves until duration seconds have passed (forever if None)"""
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.buffers = {}  # Received bytes not parsed yet, per connection
+        self.outgoing = {}  # Answers not sent yet, per connection
+        self.writing = set()  # Connections also registered for EVENT_WRITE
+        pending = []
+        oldest = 0.0
+        begin = time.perf_counter()
+        while duration is None or time.perf_counter() - begin < duration:
+            timeout = 0.1 if not pending else max(0.0, oldest + self.max_delay - time.perf_counter())
+            for key, events in self.selector.select(timeout):
+                if key.fileobj is self.listener:
+                    conn, _ = self.listener.accept()
+                    conn.setblocking(False)
+                    self.selector.register(conn, selectors.EVENT_READ)
+                    self.buffers[conn] = bytearray()
+                    self.outgoing[conn] = bytearray()
+                    continue
+                conn = key.fileobj
+                if conn not in self.buffers:
+                    continue  # Closed earlier in this round
+                if events & selectors.EVENT_WRITE:
+                    self.send(conn)
+                    if conn not in self.buffers or not events & selectors.EVENT_READ:
+                        continue
+                try:
+                    data = conn.recv(1 << 16)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError:
+                    data = b""
+                if not pending:
+                    oldest = time.perf_counter()
+                if data:
+                    self.buffers[conn] += data
+                if not data or not self.parse(conn, self.buffers[conn], pending):
+                    # Closed by the client or sent an invalid request: only this connection is dropped
+                    self.close_connection(conn)
+                    pending = [p for p in pending if p[0] is not conn]
+                    continue
+                if len(pending) >= self.max_batch:
+                    self.flush(pending)
+                    pending = []
+
+            if pending and time.perf_counter() >= oldest + self.max_delay:
+                self.flush(pending)
+                pending = []
+
+        for conn in list(self.buffers):
+            self.close_connection(conn)
+        self.selector.close()
+        self.listener.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+class PolicyClient:
+    def __init__(self, address):
+        self.sock = make_socket(address)
+        self.sock.connect(address)
+
+    def act(self, direction, food, body):
+        """Greedy action for a game given by its direction index, food position and body blocks"""
+        self.sock.sendall(pack_request(direction, food, body))
+        return recv_exactly(self.sock, 1)[0]
+
+    def act_env(self, env):
+        return self.act(DIRECTIONS.index(env.direction), env.food_pos, env.snake_body)
+
+    def close(self):
+        self.sock.close()
+
+
+def client_worker(address, duration, seed, results, max_steps=2000):
+    """Plays games whose every move comes from the server, timing each request"""
+    env = SnakeGameEnv(150, 150, growing_body=True, seed=seed, verbose=False)
+    client = PolicyClient(address)
+    latencies = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        env.reset()
+        for _ in range(max_steps):
+            start = time.perf_counter()
+            action = client.act_env(env)
+            latencies.append(time.perf_counter() - start)
+            if env.step(action)[2] or time.perf_counter() >= end:
+                break
+    client.close()
+    results.put(np.array(latencies))
+
+
+def run_server(address, table_file, duration, max_batch, max_delay, ready, batches):
+    server = PolicyServer(address, table_file, max_batch, max_delay)
+    ready.put(server.address)
+    server.serve(duration)
+    batches.put(np.array(server.batches))
+
+
+def load_test(n_clients=32, duration=5.0, address=("127.0.0.1", 0), table_file="qtable_phase3.txt",
+              max_batch=256, max_delay=0.0):
+    """Starts a server and n_clients game bots; prints p50/p99 latency and requests per second"""
+    ready, batches, results = mp.Queue(), mp.Queue(), mp.Queue()
+    server = mp.Process(target=run_server, args=(address, table_file, duration + 2, max_batch, max_delay,
+                                                 ready, batches))
+    server.start()
+    address = ready.get()
+    clients = [mp.Process(target=client_worker, args=(address, duration, seed, results))
+               for seed in range(n_clients)]
+    for p in clients:
+        p.start()
+    latencies = np.concatenate([results.get(timeout=duration + 30) for _ in clients])
+    for p in clients:
+        p.join()
+    sizes = batches.get()
+    server.join()
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print(f"{n_clients} clients: {len(latencies) / duration:.0f} requests/s, p50 {p50:.3f} ms, p99 {p99:.3f} ms, "
+          f"mean batch {sizes.mean():.1f} (max {sizes.max()})")
+    return latencies, sizes
+
+
+if __name__ == "__main__":
+    for clients in (1, 8, 32):
+        load_test(clients)
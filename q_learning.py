@@ -8,6 +8,9 @@ import numpy as np
 import random
 import json
 import time
+from state_spec import PHASE3
+
+COIN_BLOCK = 4096 # Exploration coins drawn at once by a compiled policy
 
 class QLearning:
     def __init__(self, n_states, n_actions, alpha=0.2, gamma=0.8, epsilon=0.05, epsilon_min=0, epsilon_decay=1):  # epsilon_min=0 for testing
@@ -20,9 +23,29 @@ class QLearning:
         self.epsilon = epsilon
         self.epsilon_min = epsilon_min
         self.epsilon_decay = epsilon_decay
+        self.policy = None # Greedy action of every state once compile_policy is called
         self.load_q_table()
 
+    def compile_policy(self):
+        """
+        Caches the greedy action of every state, so that choose_action is one array lookup and a
+        comparison with a pre-drawn random number. update_q_value keeps the cached row of the
+        state it changes up to date; code writing other rows must call refresh_policy.
+        """
+        self.policy = np.argmax(self.q_table, axis=1)
+        self.compiled_table = self.q_table
+        self.coins = np.random.uniform(0, 1, COIN_BLOCK)
+        self.next_coin = 0
+
+    def refresh_policy(self, state):
+        """Recomputes the cached greedy action of a state whose Q-values were changed"""
+        if self.policy is not None:
+            self.policy[state] = np.argmax(self.q_table[state])
+
     def choose_action(self, state, allowed_actions):
+        if self.policy is not None:
+            return self.choose_compiled(state, allowed_actions)
+
         if np.random.uniform(0, 1) < self.epsilon:
             action = random.choice(allowed_actions)  # Explore
         else:
@@ -31,104 +54,51 @@ class QLearning:
             
         self.epsilon = max(self.epsilon_min, self.epsilon_decay * self.epsilon)
         return action
+
+    def choose_compiled(self, state, allowed_actions):
+        if self.compiled_table is not self.q_table:
+            self.compile_policy() # A new table was assigned or loaded
+
+        explore = False
+        if self.epsilon > 0:
+            if self.next_coin == COIN_BLOCK:
+                self.coins = np.random.uniform(0, 1, COIN_BLOCK)
+                self.next_coin = 0
+            explore = self.coins[self.next_coin] < self.epsilon
+            self.next_coin += 1
+
+        action = random.choice(allowed_actions) if explore else self.policy[state]
+        self.epsilon = max(self.epsilon_min, self.epsilon_decay * self.epsilon)
+        return action
     
     def save_hyperparams(self, episode_number, total_reward, filename = "hyperparams.txt"):
         """Stores hyperparameters after each run"""
         with open(filename, "a") as f:
             f.write(f"{episode_number}\t{self.alpha}\t{self.gamma}\t{self.epsilon}\t{total_reward}\n")
 
-    def encode_state3(self, state):
+    @staticmethod
+    def encode_state3(state):
         """
-        Encodes the state tuple (food_state, danger) into an integer index,
-        according to the following scheme:
-        
+        Encodes the state tuple (food_state, danger) into an integer index in 0-319,
+        state_index = food_index * 40 + danger_code, with the tables of state_spec.PHASE3:
+
         -- Food_state --
-        There are 8 possibilities:
-        "UP" -> 0, "DOWN" -> 1, "LEFT" -> 2, "RIGHT" -> 3 
+        "UP" -> 0, "DOWN" -> 1, "LEFT" -> 2, "RIGHT" -> 3
         ("LEFT", "UP") -> 4, ("RIGHT", "UP") -> 5,
         ("LEFT", "DOWN") -> 6, ("RIGHT", "DOWN") -> 7.
-        
+
         -- Danger --
-        Danger is represented as a 3-tuple: (forced, add1, add2).
-        - forced is the opposite of the current direction.
-        - add1 and add2 are additional danger directions.
-        
-        We have three cases:
-        1. Only one danger provided: (f, "none", "none"):
-            4 possibilities.
-        2. Two dangers provided: (f, a, "none") with a != f.
-            For each forced (4 possibilities) there are 3 possible a values, totaling 12.
-            We encode these with an offset of 4.
-        3. Three dangers provided: (f, a, b) with f, a, b all distinct.
-            For each forced there are 3×2 = 6 possibilities, totaling 24.
-            We encode these with an offset of 16 (i.e. 4+12).
-        
-        The final danger code is in range 0–39. The overall state index is:
-            state_index = food_index * 40 + danger_code,
-        giving a total state space of 8 * 40 = 320.
+        A 3-tuple (forced, add1, add2): forced is the opposite of the current direction and
+        add1, add2 are additional dangers ("none" when absent).
+        1. (f, "none", "none"): codes 0-3
+        2. (f, a, "none") with a != f: codes 4-15
+        3. (f, a, b) with f, a, b all distinct: codes 16-39
+        Shorter danger tuples (get_state2, returned by reset) are padded with "none".
         """
         food_state, danger = state
-
-        # --- Encode food_state ---
-        simple_map = {"UP": 0, "DOWN": 1, "LEFT": 2, "RIGHT": 3}
-        if isinstance(food_state, str):
-            food_index = simple_map[food_state]
-        else:
-            if food_state == ("LEFT", "UP"):
-                food_index = 4
-            elif food_state == ("RIGHT", "UP"):
-                food_index = 5
-            elif food_state == ("LEFT", "DOWN"):
-                food_index = 6
-            elif food_state == ("RIGHT", "DOWN"):
-                food_index = 7
-
-        # --- Process danger ---
-        # Ensure danger is a 3-tuple.
-        if len(danger) == 1:
-            danger = (danger[0], "none", "none")
-        elif len(danger) == 2:
-            danger = (danger[0], danger[1], "none")
-        # Now danger should be (forced, add1, add2).
-        forced, add1, add2 = danger
-
-        # Basic mapping for forced.
-        forced_map = {"top": 0, "bottom": 1, "left": 2, "right": 3}
-        f_idx = forced_map.get(forced, 0)
-
-        # Determine which scenario we are in:
-        # 1-danger case
-        if add1 == "none":
-            danger_code = f_idx  # values 0-3
-
-        # 2-dangers case.
-        elif add1 != "none" and add2 == "none":
-            # Candidate list for add1: all directions except forced, in fixed order.
-            candidates = [d for d in ["top", "bottom", "left", "right"] if d != forced]
-            # There are 3 candidates. Find index of add1.
-            try:
-                pos = candidates.index(add1)
-            except ValueError:
-                pos = 0
-            danger_code = 4 + (f_idx * 3) + pos  # offset 4, total range: 4 to 15
-
-        # 3-dangers case: (f, a, b) with all distinct.
-        else:
-            candidates = [d for d in ["top", "bottom", "left", "right"] if d != forced]
-            try:
-                pos1 = candidates.index(add1)
-            except ValueError:
-                pos1 = 0
-            # For the third danger, the candidates are those in "candidates" excluding a.
-            candidates2 = [d for d in candidates if d != add1]
-            try:
-                pos2 = candidates2.index(add2)
-            except ValueError:
-                pos2 = 0
-            danger_code = 16 + (f_idx * 6) + (pos1 * 2) + pos2  # offset = 16; range: 16 to 39
-
-        state_index = food_index * 40 + danger_code
-        return state_index
+        if len(danger) < 3:
+            danger = tuple(danger) + ("none",) * (3 - len(danger))
+        return PHASE3.encode((food_state, danger))
 
     def update_q_table(self, state, action, reward, next_state):
         # Your code here
@@ -139,7 +109,10 @@ class QLearning:
         # Q(state,action) <- (1-self.alpha) Q(state,action) + self.alpha * (r + self.discount * max a' Q(nextState, a'))
         enc_state = self.encode_state3(state)
         enc_next_state = self.encode_state3(next_state)
+        self.update_q_value(enc_state, action, reward, enc_next_state)
 
+    def update_q_value(self, enc_state, action, reward, enc_next_state):
+        """Q-learning update on already encoded states"""
         # Our Q-Value
         current_q = self.q_table[enc_state][action]
 
@@ -154,6 +127,19 @@ class QLearning:
         # Write back updated Q-value into the q_table
         self.q_table[enc_state][action] = new_q
 
+        # Keep the cached greedy action of this row
+        if self.policy is not None:
+            best = self.policy[enc_state]
+            if action == best:
+                if new_q < current_q:
+                    self.policy[enc_state] = np.argmax(self.q_table[enc_state])
+            elif new_q > self.q_table[enc_state][best] or (new_q == self.q_table[enc_state][best] and action < best):
+                self.policy[enc_state] = action
+
+    def end_episode(self):
+        """Called after the last step of every episode; one-step Q-learning has nothing pending"""
+        pass
+
     def save_q_table(self, filename="qtable.txt"):
         np.savetxt(filename, self.q_table)
 
@@ -0,0 +1,122 @@
+"""
+Snake Eater compact Q-tables for inference
+Playing with epsilon = 0 (as in phase_3/test.py) only needs the greedy action of every state,
+not float64 Q-values. Two export formats, both .npy files loaded with mmap_mode="r" so that
+every inference process maps the same file (and shares its pages) instead of parsing a text
+table into its own copy:
+    - quantized: one record per state with the row minimum and scale (float32) and the
+      Q-values as int8 or int16 codes, q ~ lo + scale * (code - code_min)
+    - actions:   the greedy action of every state as uint8
+The affine mapping of a row is increasing, so the greedy action is the argmax of the codes.
+Rows where rounding would change it are repaired before saving, and check_policy compares
+any exported file with the float table.
+"""
+import os
+import numpy as np
+from q_learning import QLearning
+
+CODE_TYPES = {8: np.int8, 16: np.int16}
+
+
+def record_dtype(n_actions, bits):
+    return np.dtype([("lo", np.float32), ("scale", np.float32), ("codes", CODE_TYPES[bits], (n_actions,))])
+
+
+def quantize(q_table, bits=8):
+    """Structured array with the per-row minimum, scale and integer codes of a float Q-table"""
+    info = np.iinfo(CODE_TYPES[bits])
+    levels = int(info.max) - int(info.min)
+    lo = q_table.min(axis=1)
+    scale = (q_table.max(axis=1) - lo) / levels
+    scale[scale == 0] = 1  # Constant rows (never visited): every code is the minimum
+    codes = np.rint((q_table - lo[:, None]) / scale[:, None]) + info.min
+
+    # An action whose value is within half a step of the best one gets the same code; if it comes
+    # first, argmax would pick it, so it is moved one code down
+    greedy = np.argmax(q_table, axis=1)
+    for row in np.flatnonzero(np.argmax(codes, axis=1) != greedy):
+        ties = codes[row] == codes[row, greedy[row]]
+        ties[greedy[row]] = False
+        codes[row, ties] -= 1
+
+    table = np.zeros(len(q_table), dtype=record_dtype(q_table.shape[1], bits))
+    table["lo"] = lo
+    table["scale"] = scale
+    table["codes"] = codes
+    return table
+
+
+def dequantize(table):
+    info = np.iinfo(table["codes"].dtype)
+    return table["lo"][:, None] + table["scale"][:, None] * (table["codes"].astype(np.float64) - info.min)
+
+
+def greedy_actions(q_table):
+    return np.argmax(q_table, axis=1).astype(np.uint8)
+
+
+def export(q_table, filename, kind="int8"):
+    """Saves q_table as "int8", "int16" or "actions" in a .npy file"""
+    if kind == "actions":
+        np.save(filename, greedy_actions(q_table))
+    else:
+        np.save(filename, quantize(q_table, bits=int(kind[3:])))
+
+
+def load(filename):
+    """Memory-mapped exported table (read-only, shared by every process that maps the file)"""
+    return np.load(filename, mmap_mode="r")
+
+
+def actions_of(table):
+    """Greedy action of every state of an exported table"""
+    if table.dtype.names is None:
+        return np.asarray(table)
+    return np.argmax(table["codes"], axis=1)
+
+
+def check_policy(q_table, table):
+    """Number of states whose greedy action differs between the float table and an exported one"""
+    return int(np.sum(actions_of(table) != np.argmax(q_table, axis=1)))
+
+
+class CompactPolicy:
+    """Greedy agent on an exported table, with the choose_action interface of QLearning"""
+    encode_state3 = staticmethod(QLearning.encode_state3)
+
+    def __init__(self, filename):
+        self.table = load(filename)
+        self.epsilon = 0
+        self.quantized = self.table.dtype.names is not None
+
+    def choose_action(self, state, allowed_actions):
+        if self.quantized:
+            return int(np.argmax(self.table["codes"][state]))
+        return int(self.table[state])
+
+    def q_values(self, state):
+        """Approximate Q-values of a state (quantized tables only)"""
+        return dequantize(self.table[state:state + 1])[0]
+
+
+def main(source="qtable_phase3.txt", eval_episodes=100):
+    from training import evaluate
+
+    q_table = np.loadtxt(source)
+    base, _ = os.path.splitext(source)
+    ql = QLearning(n_states=len(q_table), n_actions=q_table.shape[1], epsilon=0)
+    ql.q_table = q_table
+    print(f"{source}: {os.path.getsize(source)} bytes as text, {q_table.nbytes} bytes in memory, "
+          f"greedy mean score {evaluate(ql, eval_episodes, seed=12345):.1f}")
+    for kind in ("int16", "int8", "actions"):
+        filename = f"{base}_{kind}.npy"
+        export(q_table, filename, kind)
+        table = load(filename)
+        error = np.max(np.abs(dequantize(table) - q_table)) if kind != "actions" else 0
+        print(f"{filename}: {os.path.getsize(filename)} bytes, {check_policy(q_table, table)} greedy actions "
+              f"changed, max error {error:.3f}, greedy mean score "
+              f"{evaluate(CompactPolicy(filename), eval_episodes, seed=12345):.1f}")
+
+
+if __name__ == "__main__":
+    main()
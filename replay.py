@@ -0,0 +1,243 @@
+"""
+Snake Eater Replay
+Records SnakeGameEnv episodes as an action stream with periodic full-state keyframes,
+so that any step of a long episode can be reached without replaying it from the start.
+
+File layout (little endian):
+    header    -> magic, version, frame size, growing_body, keyframe interval
+    segments  -> one keyframe followed by the actions (1 byte each) until the next keyframe
+    footer    -> keyframe steps (uint32) and file offsets (uint64)
+    trailer   -> footer offset, number of steps, number of keyframes, magic
+"""
+import bisect
+import mmap
+import os
+import struct
+import sys
+import numpy as np
+from snake_env import SnakeGameEnv
+
+MAGIC = b"SNKR"
+VERSION = 1
+DIRECTIONS = ["UP", "DOWN", "LEFT", "RIGHT"]  # Same order as the actions
+
+HEADER = struct.Struct("<4sHHHBI")         # magic, version, frame_x, frame_y, growing_body, keyframe_interval
+KEYFRAME = struct.Struct("<IhhhhBBiBBH")  # step, head x/y, food x/y, direction, food_spawn, score, game_over, rng version, body length
+RNG_STATE = struct.Struct("<625IBd")      # Mersenne Twister words, has_gauss, gauss_next
+TRAILER = struct.Struct("<QQI4s")          # footer offset, steps, keyframes, magic
+
+
+def pack_keyframe(step, snapshot):
+    """Serializes a SnakeGameEnv snapshot taken right before the action of the given step"""
+    rng_version, rng_words, gauss_next = snapshot["rng_state"]
+    body = np.asarray(snapshot["snake_body"], dtype=np.int16)
+    head = KEYFRAME.pack(step,
+                         snapshot["snake_pos"][0], snapshot["snake_pos"][1],
+                         snapshot["food_pos"][0], snapshot["food_pos"][1],
+                         DIRECTIONS.index(snapshot["direction"]), int(snapshot["food_spawn"]),
+                         snapshot["score"], int(snapshot["game_over"]),
+                         rng_version, len(body))
+    rng = RNG_STATE.pack(*rng_words, gauss_next is not None, gauss_next or 0.0)
+    return head + body.tobytes() + rng
+
+
+def unpack_keyframe(buffer, offset):
+    """Inverse of pack_keyframe. Returns (step, snapshot, offset of the first action)"""
+    (step, head_x, head_y, food_x, food_y, direction, food_spawn,
+     score, game_over, rng_version, body_len) = KEYFRAME.unpack_from(buffer, offset)
+    offset += KEYFRAME.size
+    body = np.frombuffer(buffer, dtype=np.int16, count=body_len * 2, offset=offset).reshape(-1, 2)
+    offset += body.nbytes
+    rng = RNG_STATE.unpack_from(buffer, offset)
+    offset += RNG_STATE.size
+    snapshot = {
+        "snake_pos": [head_x, head_y],
+        "snake_body": body.tolist(),
+        "food_pos": [food_x, food_y],
+        "food_spawn": bool(food_spawn),
+        "direction": DIRECTIONS[direction],
+        "score": score,
+        "game_over": bool(game_over),
+        "rng_state": (rng_version, tuple(rng[:625]), rng[626] if rng[625] else None),
+    }
+    return step, snapshot, offset
+
+
+class ReplayWriter:
+    """
+    Streams an episode to disk. Call record(action) right before every env.step(action);
+    a keyframe of the environment is stored every keyframe_interval steps.
+    """
+    def __init__(self, filename, env, keyframe_interval=256):
+        self.env = env
+        self.keyframe_interval = keyframe_interval
+        self.n_steps = 0
+        self.keyframe_steps = []
+        self.keyframe_offsets = []
+        self.file = open(filename, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, env.frame_size_x, env.frame_size_y,
+                                    int(env.growing_body), keyframe_interval))
+        self._write_keyframe()
+
+    def _write_keyframe(self):
+        self.keyframe_steps.append(self.n_steps)
+        self.keyframe_offsets.append(self.file.tell())
+        self.file.write(pack_keyframe(self.n_steps, self.env.get_snapshot()))
+
+    def record(self, action):
+        """Stores the action about to be applied to the environment"""
+        if self.n_steps > 0 and self.n_steps % self.keyframe_interval == 0:
+            self._write_keyframe()
+        self.file.write(bytes((int(action),)))
+        self.n_steps += 1
+
+    def close(self):
+        """Writes the keyframe index footer and closes the file"""
+        if self.file.closed:
+            return
+        footer_offset = self.file.tell()
+        self.file.write(np.asarray(self.keyframe_steps, dtype=np.uint32).tobytes())
+        self.file.write(np.asarray(self.keyframe_offsets, dtype=np.uint64).tobytes())
+        self.file.write(TRAILER.pack(footer_offset, self.n_steps, len(self.keyframe_steps), MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplayReader:
+    """
+    Random access to a recorded episode. state_at(step) restores the nearest previous
+    keyframe and simulates at most keyframe_interval - 1 actions from there.
+    """
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, frame_x, frame_y, growing_body, self.keyframe_interval = HEADER.unpack_from(self.buffer, 0)
+        footer_offset, self.n_steps, n_keyframes, trailer_magic = TRAILER.unpack_from(
+            self.buffer, len(self.buffer) - TRAILER.size)
+        if magic != MAGIC or trailer_magic != MAGIC:
+            raise ValueError(f"{filename} is not a complete replay file")
+        if version != VERSION:
+            raise ValueError(f"Unsupported replay version {version}")
+
+        self.keyframe_steps = np.frombuffer(self.buffer, dtype=np.uint32, count=n_keyframes,
+                                            offset=footer_offset).tolist()
+        self.keyframe_offsets = np.frombuffer(self.buffer, dtype=np.uint64, count=n_keyframes,
+                                              offset=footer_offset + 4 * n_keyframes).tolist()
+        self.env = SnakeGameEnv(frame_x, frame_y, bool(growing_body), verbose=False)
+
+    def actions(self, keyframe):
+        """Returns the actions stored after the given keyframe (index into keyframe_steps)"""
+        _, _, start = unpack_keyframe(self.buffer, self.keyframe_offsets[keyframe])
+        first = self.keyframe_steps[keyframe]
+        last = self.keyframe_steps[keyframe + 1] if keyframe + 1 < len(self.keyframe_steps) else self.n_steps
+        return np.frombuffer(self.buffer, dtype=np.uint8, count=last - first, offset=start)
+
+    def action_at(self, step):
+        """Action taken at the given step"""
+        keyframe = bisect.bisect_right(self.keyframe_steps, step) - 1
+        return int(self.actions(keyframe)[step - self.keyframe_steps[keyframe]])
+
+    def state_at(self, step):
+        """Returns the environment positioned right before the action of the given step"""
+        step = min(max(step, 0), self.n_steps)
+        keyframe = bisect.bisect_right(self.keyframe_steps, step) - 1
+        _, snapshot, _ = unpack_keyframe(self.buffer, self.keyframe_offsets[keyframe])
+        self.env.load_snapshot(snapshot)
+        for action in self.actions(keyframe)[:step - self.keyframe_steps[keyframe]]:
+            self.env.step(int(action))
+        return self.env
+
+    def close(self):
+        self.buffer.close()
+
+
+def record_episode(filename, q_table_file="qtable_phase3.txt", keyframe_interval=256, seed=None, max_steps=100000):
+    """Plays one greedy episode with a trained Q-table and records it"""
+    from q_learning import QLearning
+
+    env = SnakeGameEnv(150, 150, growing_body=True, seed=seed, verbose=False)
+    ql = QLearning(n_states=320, n_actions=4, epsilon=0)
+    ql.load_q_table(q_table_file)
+
+    state = env.reset()
+    game_over = False
+    with ReplayWriter(filename, env, keyframe_interval) as writer:
+        while not game_over and writer.n_steps < max_steps:
+            action = ql.choose_action(ql.encode_state3(state), [0, 1, 2, 3])
+            writer.record(action)
+            state, reward, game_over = env.step(action)
+    return writer.n_steps
+
+
+class ReplayViewer:
+    """
+    Pygame viewer for recorded episodes.
+    Space: pause/resume, Left/Right: one step, Down/Up: one keyframe interval, Home/End: start/end.
+    """
+    def __init__(self, filename):
+        self.reader = ReplayReader(filename)
+        self.step = 0
+        self.env = self.reader.state_at(0)
+
+    def seek(self, step):
+        step = min(max(step, 0), self.reader.n_steps)
+        # Moving a few steps forward is cheaper than restoring a keyframe
+        if 0 <= step - self.step < self.reader.keyframe_interval:
+            for s in range(self.step, step):
+                self.env.step(self.reader.action_at(s))
+        else:
+            self.env = self.reader.state_at(step)
+        self.step = step
+
+    def run(self, start_step=0, difficulty=15):
+        import pygame
+        from SnakeGame import draw_game
+
+        pygame.init()
+        game_window = pygame.display.set_mode((self.env.frame_size_x, self.env.frame_size_y))
+        fps_controller = pygame.time.Clock()
+        jumps = {pygame.K_RIGHT: 1, pygame.K_LEFT: -1,
+                 pygame.K_UP: self.reader.keyframe_interval, pygame.K_DOWN: -self.reader.keyframe_interval}
+        self.seek(start_step)
+        paused = False
+
+        while True:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    return
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_SPACE:
+                        paused = not paused
+                    elif event.key in jumps:
+                        paused = True
+                        self.seek(self.step + jumps[event.key])
+                    elif event.key == pygame.K_HOME:
+                        self.seek(0)
+                    elif event.key == pygame.K_END:
+                        self.seek(self.reader.n_steps)
+
+            if not paused and self.step < self.reader.n_steps:
+                self.seek(self.step + 1)
+
+            draw_game(game_window, self.env.get_body(), self.env.get_food())
+            pygame.display.set_caption(f"Step {self.step}/{self.reader.n_steps}")
+            pygame.display.flip()
+            fps_controller.tick(difficulty)
+
+
+def main(filename="episode.snkr", start_step=0, difficulty=15):
+    if not os.path.exists(filename):
+        n_steps = record_episode(filename)
+        print(f"Recorded {n_steps} steps in {filename}")
+    ReplayViewer(filename).run(start_step, difficulty)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2], *[int(arg) for arg in sys.argv[2:4]])
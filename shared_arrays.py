@@ -0,0 +1,50 @@
+"""
+Snake Eater shared arrays
+Groups several NumPy arrays in one multiprocessing.shared_memory block, so worker processes
+can read and write them in place without pickling anything after start-up.
+"""
+import numpy as np
+from multiprocessing import shared_memory
+
+
+class SharedArrays:
+    def __init__(self, layout, name=None):
+        """
+        layout is a dict name -> (dtype, shape). Without a name a new block is created (and
+        unlinked again by close); with a name, the block created by another process is attached.
+        """
+        self.layout = layout
+        offsets = {}
+        size = 0
+        for key, (dtype, shape) in layout.items():
+            offsets[key] = size
+            nbytes = int(np.dtype(dtype).itemsize * np.prod(shape, dtype=np.int64))
+            size += (nbytes + 7) // 8 * 8  # Keep every array 8-byte aligned
+
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=max(size, 8))
+        else:
+            # Child processes share the resource tracker of their parent, so attaching does not
+            # register the block a second time and only the creator unlinks it.
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        self.arrays = {key: np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offsets[key])
+                       for key, (dtype, shape) in layout.items()}
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def close(self):
+        self.arrays = {}
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # Some views are still referenced; the mapping is released together with them
+        if self.owner:
+            self.shm.unlink()
+            self.owner = False
@@ -8,11 +8,14 @@ import numpy as np
 import random
 
 class SnakeGameEnv:
-    def __init__(self, frame_size_x=150, frame_size_y=150, growing_body=True):
+    def __init__(self, frame_size_x=150, frame_size_y=150, growing_body=True, seed=None, verbose=True):
         # Initializes the environment with default values
         self.frame_size_x = frame_size_x
         self.frame_size_y = frame_size_y
         self.growing_body = growing_body
+        self.verbose = verbose # Print the food and body positions on every reset
+        # Own random generator so food spawns can be reproduced (replays, seeded runs)
+        self.rng = random.Random(seed)
         self.reset()
 
     def reset(self):
@@ -22,30 +25,32 @@ class SnakeGameEnv:
         
         # Generate food position with border appearance chance
         while True:
-            if random.random() < 0.25:
+            if self.rng.random() < 0.25:
                 # 10% chance: choose a border randomly
-                border = random.choice(["top", "bottom", "left", "right"])
+                border = self.rng.choice(["top", "bottom", "left", "right"])
                 if border == "top":
-                    x = random.randrange(0, self.frame_size_x, 10)
+                    x = self.rng.randrange(0, self.frame_size_x, 10)
                     y = 0
                 elif border == "bottom":
-                    x = random.randrange(0, self.frame_size_x, 10)
+                    x = self.rng.randrange(0, self.frame_size_x, 10)
                     y = self.frame_size_y - 10
                 elif border == "left":
                     x = 0
-                    y = random.randrange(0, self.frame_size_y, 10)
+                    y = self.rng.randrange(0, self.frame_size_y, 10)
                 elif border == "right":
                     x = self.frame_size_x - 10
-                    y = random.randrange(0, self.frame_size_y, 10)
+                    y = self.rng.randrange(0, self.frame_size_y, 10)
             else:
                 # Otherwise, appear anywhere on the grid
-                x = random.randrange(0, self.frame_size_x, 10)
-                y = random.randrange(0, self.frame_size_y, 10)
+                x = self.rng.randrange(0, self.frame_size_x, 10)
+                y = self.rng.randrange(0, self.frame_size_y, 10)
                 
             food_pos = [x, y]
-            print("Food Position",food_pos)
+            if self.verbose:
+                print("Food Position",food_pos)
             # Ensure the food is not inside the snake's body
-            print("Snake_body", self.snake_body)
+            if self.verbose:
+                print("Snake_body", self.snake_body)
             if food_pos not in self.snake_body:
                 break
 
@@ -262,6 +267,34 @@ class SnakeGameEnv:
         return (food_state, danger)
 
 
+    def get_snapshot(self):
+        """
+        Returns a copy of everything needed to restore the game at the current step:
+        snake head and body, food, direction, score, flags and the random generator state.
+        """
+        return {
+            "snake_pos": list(self.snake_pos),
+            "snake_body": [list(block) for block in self.snake_body],
+            "food_pos": list(self.food_pos),
+            "food_spawn": self.food_spawn,
+            "direction": self.direction,
+            "score": self.score,
+            "game_over": self.game_over,
+            "rng_state": self.rng.getstate(),
+        }
+
+    def load_snapshot(self, snapshot):
+        """Restores a game previously stored with get_snapshot"""
+        self.snake_pos = list(snapshot["snake_pos"])
+        self.snake_body = [list(block) for block in snapshot["snake_body"]]
+        self.food_pos = list(snapshot["food_pos"])
+        self.food_spawn = snapshot["food_spawn"]
+        self.direction = snapshot["direction"]
+        self.score = snapshot["score"]
+        self.game_over = snapshot["game_over"]
+        self.rng.setstate(snapshot["rng_state"])
+
+
     def get_body(self):
     	return self.snake_body
     
@@ -356,29 +389,29 @@ class SnakeGameEnv:
         if not self.food_spawn:
 
             # With a 25% chance the food will appear in on e of the borders
-            if random.random() < 0.00:
-                border = random.choice(["top", "bottom", "left", "right"])
+            if self.rng.random() < 0.00:
+                border = self.rng.choice(["top", "bottom", "left", "right"])
                 if border == "top":
-                    x = random.randrange(0, self.frame_size_x, 10)
+                    x = self.rng.randrange(0, self.frame_size_x, 10)
                     y = 0
                 elif border == "bottom":
-                    x = random.randrange(0, self.frame_size_x, 10)
+                    x = self.rng.randrange(0, self.frame_size_x, 10)
                     y = self.frame_size_y - 10
                 elif border == "left":
                     x = 0
-                    y = random.randrange(0, self.frame_size_y, 10)
+                    y = self.rng.randrange(0, self.frame_size_y, 10)
                 elif border == "right":
                     x = self.frame_size_x - 10
-                    y = random.randrange(0, self.frame_size_y, 10)
+                    y = self.rng.randrange(0, self.frame_size_y, 10)
             else:
                 # Otherwise, appear anywhere on the grid
-                x = random.randrange(0, self.frame_size_x, 10)
-                y = random.randrange(0, self.frame_size_y, 10)
+                x = self.rng.randrange(0, self.frame_size_x, 10)
+                y = self.rng.randrange(0, self.frame_size_y, 10)
                 
             self.food_pos = [x, y]
 
             while self.food_pos in self.snake_body: # Ensures that the food does not spawn inside the body
-                self.food_pos = [random.randrange(1, (self.frame_size_x//10)) * 10, random.randrange(1, (self.frame_size_x//10)) * 10]
+                self.food_pos = [self.rng.randrange(1, (self.frame_size_x//10)) * 10, self.rng.randrange(1, (self.frame_size_x//10)) * 10]
         self.food_spawn = True
         
         
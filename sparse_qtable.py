@@ -0,0 +1,363 @@
+"""
+Snake Eater hashed sparse Q-table
+QLearning.load_q_table allocates np.zeros((n_states, n_actions)), which is fine for the 320
+phase 3 states but not for richer encodings whose state space is the product of many features.
+HashedQTable only stores the states that are visited:
+    - states are 64-bit keys (hash_features mixes any tuple of integer features into one)
+    - open addressing with linear probing over NumPy arrays (keys, occupancy, Q-rows, last use
+      and visit counters), doubling the capacity until the memory cap is reached
+    - past the cap, the least recently used ("lru") or least frequently used ("lfu") entries
+      are evicted in one batch and the survivors are rehashed
+    - lookup/update work on whole batches of keys; get_row/set_value serve single states
+    - stats() reports occupancy, probe lengths, collisions and evictions
+SparseQLearning is a QLearning on top of it, and RichSnakeEnv a phase 3 game with extra
+features (food offset, tail direction, distance to the body along each ray) to try it.
+"""
+import random
+import numpy as np
+from q_learning import QLearning
+from snake_env import SnakeGameEnv
+from state_spec import PHASE3
+
+MASK64 = (1 << 64) - 1
+
+
+def mix64(x):
+    """splitmix64 finalizer on a uint64 array"""
+    with np.errstate(over="ignore"):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def mix64_int(x):
+    """mix64 on a Python int (same result as the array version)"""
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def hash_features(features):
+    """64-bit key of a tuple of integer features, or uint64 keys of an (N, n_features) array"""
+    if isinstance(features, np.ndarray):
+        keys = np.zeros(len(features), dtype=np.uint64)
+        for column in features.T:
+            keys = mix64(keys ^ column.astype(np.int64).astype(np.uint64))
+        return keys
+    key = 0
+    for value in features:
+        key = mix64_int(key ^ (value & MASK64))
+    return key
+
+
+class HashedQTable:
+    def __init__(self, n_actions, max_bytes=64 << 20, eviction="lru", evict_fraction=0.25, max_load=0.5,
+                 initial_capacity=1024, default=0.0):
+        """
+        max_bytes:      memory cap of the arrays
+        eviction:       "lru" (least recently used) or "lfu" (least frequently used)
+        evict_fraction: fraction of the entries removed by one eviction
+        max_load:       maximum occupied fraction of the slots, to keep the probes short
+        """
+        if eviction not in ("lru", "lfu"):
+            raise ValueError(f"Unknown eviction policy {eviction}")
+        self.n_actions = n_actions
+        self.eviction = eviction
+        self.evict_fraction = evict_fraction
+        self.max_load = max_load
+        self.default = default
+        slot_bytes = 8 + 8 * n_actions + 8 + 8 + 1  # key, Q-row, last use, visits, occupancy
+        max_capacity = 1 << max(int(max_bytes // slot_bytes).bit_length() - 1, 4)
+        self.max_capacity = max_capacity
+        self.max_entries = int(max_capacity * max_load)
+        self.clock = 0
+        self.counters = {"lookups": 0, "probes": 0, "inserts": 0, "collisions": 0, "evictions": 0, "rehashes": 0}
+        self._allocate(min(1 << (initial_capacity - 1).bit_length(), max_capacity))
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.mask = np.uint64(capacity - 1)
+        self.keys = np.zeros(capacity, dtype=np.uint64)
+        self.occupied = np.zeros(capacity, dtype=bool)
+        self.values = np.full((capacity, self.n_actions), self.default, dtype=np.float64)
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.visits = np.zeros(capacity, dtype=np.int64)
+        self.entries = 0
+
+    def __len__(self):
+        return self.entries
+
+    def _home(self, keys):
+        return (mix64(keys) & self.mask).astype(np.int64)
+
+    def find(self, keys):
+        """Slots of an array of uint64 keys, -1 for the keys not in the table"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        slots = self._home(keys)
+        found = np.full(len(keys), -1, dtype=np.int64)
+        pending = np.arange(len(keys))
+        self.counters["lookups"] += len(keys)
+        while len(pending):
+            s = slots[pending]
+            occupied = self.occupied[s]
+            match = occupied & (self.keys[s] == keys[pending])
+            found[pending[match]] = s[match]
+            pending = pending[occupied & ~match]
+            slots[pending] = (slots[pending] + 1) & (self.capacity - 1)
+            self.counters["probes"] += len(pending)
+        return found
+
+    def _insert(self, keys):
+        """Inserts distinct keys known to be absent, assuming there is room; returns their slots"""
+        slots = self._home(keys)
+        placed = np.full(len(keys), -1, dtype=np.int64)
+        pending = np.arange(len(keys))
+        while len(pending):
+            s = slots[pending]
+            free = ~self.occupied[s]
+            # Several keys may aim at the same free slot: the first one takes it
+            _, first = np.unique(s[free], return_index=True)
+            winners = pending[free][first]
+            won = slots[winners]
+            self.keys[won] = keys[winners]
+            self.occupied[won] = True
+            placed[winners] = won
+            pending = pending[placed[pending] < 0]
+            slots[pending] = (slots[pending] + 1) & (self.capacity - 1)
+            self.counters["collisions"] += len(pending)
+        self.entries += len(keys)
+        self.counters["inserts"] += len(keys)
+        return placed
+
+    def _rehash(self, capacity, keep):
+        """Moves the entries of the slots in keep to new arrays of the given capacity"""
+        keys, values = self.keys[keep], self.values[keep]
+        last_used, visits = self.last_used[keep], self.visits[keep]
+        inserts = self.counters["inserts"]
+        self._allocate(capacity)
+        slots = self._insert(keys)
+        self.counters["inserts"] = inserts
+        self.values[slots] = values
+        self.last_used[slots] = last_used
+        self.visits[slots] = visits
+        self.counters["rehashes"] += 1
+
+    def _make_room(self, n_new, protected_keys):
+        """
+        Grows or evicts so that n_new keys fit; the protected keys (current batch) are never evicted.
+        Raises MemoryError if they do not fit even after evicting every other entry, so the table
+        always keeps free slots (find stops at the first one).
+        """
+        while self.entries + n_new > self.capacity * self.max_load and self.capacity < self.max_capacity:
+            self._rehash(self.capacity * 2, np.flatnonzero(self.occupied))
+        if self.entries + n_new <= self.max_entries:
+            return
+        if n_new > self.max_entries:
+            raise MemoryError(f"{n_new} new states do not fit in {self.max_entries} entries")
+
+        occupied = np.flatnonzero(self.occupied)
+        scores = (self.last_used if self.eviction == "lru" else self.visits)[occupied].astype(np.float64)
+        protected = self.find(protected_keys)
+        scores[np.isin(occupied, protected[protected >= 0])] = np.inf
+        needed = self.entries + n_new - self.max_entries
+        evictable = int(np.sum(np.isfinite(scores)))
+        if needed > evictable:
+            raise MemoryError(f"{n_new} new states and {self.entries - evictable} states of the same batch do not "
+                              f"fit in {self.max_entries} entries")
+        n_evict = min(max(needed, int(self.evict_fraction * self.entries)), evictable)
+        order = np.argpartition(scores, n_evict - 1)
+        self.counters["evictions"] += n_evict
+        self._rehash(self.capacity, occupied[order[n_evict:]])
+
+    def slots_for(self, keys):
+        """Slots of the keys, inserting the missing ones with default Q-values"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        slots = self.find(keys)
+        if np.any(slots < 0):
+            missing = np.unique(keys[slots < 0])
+            self._make_room(len(missing), keys)
+            slots = self.find(keys)  # The slots move when the table is rehashed
+            missing_slots = self._insert(missing)
+            slots[slots < 0] = missing_slots[np.searchsorted(missing, keys[slots < 0])]
+        return slots
+
+    def _touch(self, slots):
+        self.clock += 1
+        self.last_used[slots] = self.clock
+        np.add.at(self.visits, slots, 1)
+
+    def lookup(self, keys):
+        """(N, n_actions) Q-values of an array of keys; unknown keys get the default value and are not inserted"""
+        slots = self.find(keys)
+        rows = np.full((len(slots), self.n_actions), self.default)
+        known = slots >= 0
+        rows[known] = self.values[slots[known]]
+        self._touch(slots[known])
+        return rows
+
+    def update(self, keys, actions, targets, alpha):
+        """Q(key, action) += alpha * (target - Q(key, action)) for a batch, repeated pairs included"""
+        slots = self.slots_for(keys)
+        errors = np.asarray(targets) - self.values[slots, actions]
+        np.add.at(self.values, (slots, actions), alpha * errors)
+        self._touch(slots)
+
+    def _find_one(self, key):
+        slot = int(mix64_int(key) & (self.capacity - 1))
+        self.counters["lookups"] += 1
+        while self.occupied[slot]:
+            if self.keys[slot] == key:
+                return slot
+            slot = (slot + 1) & (self.capacity - 1)
+            self.counters["probes"] += 1
+        return -1
+
+    def get_row(self, key):
+        """Q-values of one key (a copy; the default row if unknown)"""
+        slot = self._find_one(key)
+        if slot < 0:
+            return np.full(self.n_actions, self.default)
+        self.clock += 1
+        self.last_used[slot] = self.clock
+        self.visits[slot] += 1
+        return self.values[slot].copy()
+
+    def set_value(self, key, action, value):
+        slot = self._find_one(key)
+        if slot < 0:
+            slot = int(self.slots_for(np.array([key], dtype=np.uint64))[0])
+        self.values[slot, action] = value
+
+    def items(self):
+        """(keys, Q-rows) of all the stored states"""
+        occupied = np.flatnonzero(self.occupied)
+        return self.keys[occupied], self.values[occupied]
+
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.keys, self.occupied, self.values, self.last_used, self.visits))
+
+    def stats(self):
+        lookups = max(self.counters["lookups"], 1)
+        return {"entries": self.entries, "capacity": self.capacity, "max_entries": self.max_entries,
+                "load": self.entries / self.capacity, "bytes": self.nbytes(),
+                "mean_probes": self.counters["probes"] / lookups, **self.counters}
+
+
+class SparseQLearning(QLearning):
+    """QLearning whose states are 64-bit keys stored in a HashedQTable"""
+    def __init__(self, n_actions=4, alpha=0.2, gamma=0.8, epsilon=0.05, epsilon_min=0, epsilon_decay=1,
+                 key_fn=None, **table_kwargs):
+        self.key_fn = key_fn or QLearning.encode_state3
+        self.table_kwargs = table_kwargs
+        super().__init__(None, n_actions, alpha, gamma, epsilon, epsilon_min, epsilon_decay)
+
+    def encode_state3(self, state):
+        """Key of a state tuple (the phase 3 index by default)"""
+        return self.key_fn(state)
+
+    def choose_action(self, state, allowed_actions):
+        if np.random.uniform(0, 1) < self.epsilon:
+            action = random.choice(allowed_actions)  # Explore
+        else:
+            action = np.argmax(self.q_table.get_row(state))  # Exploit
+
+        self.epsilon = max(self.epsilon_min, self.epsilon_decay * self.epsilon)
+        return action
+
+    def update_q_value(self, enc_state, action, reward, enc_next_state):
+        current_q = self.q_table.get_row(enc_state)[action]
+
+        # Terminal state if snake dies
+        if reward == -75:
+            new_q = (1 - self.alpha) * current_q + self.alpha * reward
+        # Non-terminal state
+        else:
+            new_q = (1 - self.alpha) * current_q + self.alpha * (
+                reward + self.gamma * np.max(self.q_table.get_row(enc_next_state)))
+        self.q_table.set_value(enc_state, action, new_q)
+
+    def save_q_table(self, filename="qtable_sparse.npz"):
+        keys, values = self.q_table.items()
+        np.savez(filename, keys=keys, values=values)
+
+    def load_q_table(self, filename="qtable_sparse.npz"):
+        self.q_table = HashedQTable(self.n_actions, **self.table_kwargs)
+        try:
+            with np.load(filename) as data:
+                keys, values = data["keys"], data["values"]
+        except IOError:
+            return
+        slots = self.q_table.slots_for(keys)
+        self.q_table.values[slots] = values
+
+
+class RichSnakeEnv(SnakeGameEnv):
+    """
+    Phase 3 game whose states also hold the food offset in cells, the direction of the tail
+    and the free cells before the body along the four rays from the head:
+        (food_state, danger, (dx, dy), tail_direction, (up, down, left, right))
+    """
+    def reset(self):
+        super().reset()
+        return self.get_state3()
+
+    def get_state3(self):
+        food_state, danger = super().get_state3()
+        head_x, head_y = self.snake_body[0]
+        offset = ((self.food_pos[0] - head_x) // 10, (self.food_pos[1] - head_y) // 10)
+        (tail_x, tail_y), (before_x, before_y) = self.snake_body[-1], self.snake_body[-2]
+        tail = (int(np.sign(before_x - tail_x)), int(np.sign(before_y - tail_y)))
+
+        body = {tuple(block) for block in self.snake_body[1:]}
+        rays = []
+        for step_x, step_y in ((0, -10), (0, 10), (-10, 0), (10, 0)):
+            x, y, free = head_x + step_x, head_y + step_y, 0
+            while 0 <= x < self.frame_size_x and 0 <= y < self.frame_size_y and (x, y) not in body:
+                x, y, free = x + step_x, y + step_y, free + 1
+            rays.append(free)
+        return food_state, danger, offset, tail, tuple(rays)
+
+
+def rich_key(state):
+    food_state, danger, offset, tail, rays = state
+    return hash_features((PHASE3.encode((food_state, danger)),) + offset + tail + rays)
+
+
+def compare(episodes=2000, max_bytes=1 << 18, seed=0, max_steps=2000):
+    """Trains on the rich states with the LRU and LFU policies under a small memory cap"""
+    from training import run_episode
+
+    for eviction in ("lru", "lfu"):
+        random.seed(seed)
+        np.random.seed(seed)
+        env = RichSnakeEnv(150, 150, growing_body=True, seed=seed, verbose=False)
+        ql = SparseQLearning(alpha=0.1, gamma=0.9, epsilon=0.05, key_fn=rich_key, max_bytes=max_bytes,
+                             eviction=eviction)
+        scores = [run_episode(env, ql, training=True, max_steps=max_steps)[0] for _ in range(episodes)]
+        print(f"{eviction}: mean score of the last 100 episodes {np.mean(scores[-100:]):.1f}")
+        print(f"    {ql.q_table.stats()}")
+
+
+def check_capacity():
+    """A batch of protected and new keys larger than the free entries raises MemoryError and leaves free slots"""
+    table = HashedQTable(4, max_bytes=16 * 49)  # 16 slots, 8 entries
+    table.update(np.arange(8, dtype=np.uint64), np.zeros(8, dtype=np.int64), np.ones(8), 1.0)
+    try:
+        table.update(np.arange(16, dtype=np.uint64), np.zeros(16, dtype=np.int64), np.ones(16), 1.0)
+        raise AssertionError("The batch should not fit")
+    except MemoryError:
+        pass
+    assert len(table) <= table.max_entries < table.capacity
+    assert np.all(table.lookup(np.array([99], dtype=np.uint64)) == table.default)
+
+    # Smaller batches still evict the old keys and fit
+    table.update(np.arange(8, 12, dtype=np.uint64), np.zeros(4, dtype=np.int64), np.ones(4), 1.0)
+    assert len(table) <= table.max_entries and np.all(table.find(np.arange(8, 12, dtype=np.uint64)) >= 0)
+    print("Capacity checks passed")
+
+
+if __name__ == "__main__":
+    check_capacity()
+    compare()
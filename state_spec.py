@@ -0,0 +1,227 @@
+"""
+Snake Eater declarative state encodings
+A StateSpec lists the features of a state with their domains, in the order of the state tuple
+returned by the environment. The state index is the mixed-radix number whose digits are the
+positions of the feature values in their domains (first feature most significant):
+    index = digit_0 * (n_1 * n_2 * ...) + digit_1 * (n_2 * ...) + ... + digit_last
+Every table is built once in the constructor (value -> digit and state -> index for encoding,
+index -> state for decoding), so encoding is a lookup instead of if-chains, and batches of
+indices are converted with NumPy arithmetic.
+
+For batches, a feature can also have an integer coding, {code: value}, where the code is what
+NumPy code computes from the game (several codes may give the same value). It becomes an array
+code -> digit, so encode_batch turns an (N, n_features) array of codes into indices with array
+lookups only. Features without a coding use their digits as codes.
+
+Features whose values are not independent (the 40 danger triples of phase 3, the 28
+(border, food_state) pairs of phase 2) are a single feature whose domain lists the valid
+combinations in table order. A spec with a single feature encodes that feature's value itself.
+
+The tables are filled once in the constructor: encoding a state tuple is one lookup in the
+state -> index table, and encode_batch works on integer codes with array lookups only.
+
+    PHASE3      = encode_state3 in q_learning.py, which encodes through it
+    PHASE2      = encode_state in phase_2/q_learning2.py
+    EGOCENTRIC  = encode_state_egocentric in egocentric.py
+phase_2/ and phase_3/ are the archived games, run from their own folders without the root
+modules, so they keep their hand-written encoders (encode_state, phase_3/q_learning.py
+encode_state3 and phase_3/analysis.py decode_state); running this module checks PHASE2 and
+PHASE3 against the first two.
+"""
+import itertools
+import numpy as np
+
+FOOD_STATES = ["UP", "DOWN", "LEFT", "RIGHT", ("LEFT", "UP"), ("RIGHT", "UP"), ("LEFT", "DOWN"), ("RIGHT", "DOWN")]
+SIDES = ["top", "bottom", "left", "right"]
+MAX_TABLE_SIZE = 1 << 20  # Larger spaces encode and decode through the digits only
+
+
+def object_array(values):
+    """1-D object array of the values (np.array would split tuples into a second dimension)"""
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+class StateSpec:
+    def __init__(self, features):
+        """
+        features: list of (name, domain) or (name, domain, coding), domain being the list of values
+        of the feature and coding a dict {integer code: value}
+        """
+        self.names = [name for name, *_ in features]
+        self.domains = [list(domain) for _, domain, *_ in features]
+        self.radices = np.array([len(domain) for domain in self.domains], dtype=np.int64)
+        self.strides = np.ones(len(self.radices), dtype=np.int64)
+        for i in range(len(self.radices) - 2, -1, -1):
+            self.strides[i] = self.strides[i + 1] * self.radices[i + 1]
+        self.size = int(np.prod(self.radices))
+
+        # Encoding tables
+        self.digits = [{value: digit for digit, value in enumerate(domain)} for domain in self.domains]
+        if any(len(table) != len(domain) for table, domain in zip(self.digits, self.domains)):
+            raise ValueError("Repeated value in a feature domain")
+        # Batch encoding tables: code -> digit (-1 for codes without a value)
+        self.codings = [coding[0] if coding else None for _, _, *coding in features]
+        self.code_tables = []
+        for (_, domain, *coding), digits in zip(features, self.digits):
+            if coding:
+                table = np.full(max(coding[0]) + 1, -1, dtype=np.int64)
+                for code, value in coding[0].items():
+                    table[code] = digits[value]
+            else:
+                table = np.arange(len(domain), dtype=np.int64)
+            self.code_tables.append(table)
+        # Decoding tables
+        self.values = [object_array(domain) for domain in self.domains]
+        self.states = None
+        self.index_of = None
+        if self.size <= MAX_TABLE_SIZE:
+            self.states = [self.decode_digits(digits) for digits in self.decode_batch(np.arange(self.size))]
+            self.index_of = {state: index for index, state in enumerate(self.states)}
+
+    def __len__(self):
+        return self.size
+
+    def decode_digits(self, digits):
+        values = tuple(domain[digit] for domain, digit in zip(self.domains, digits))
+        return values[0] if len(values) == 1 else values
+
+    def encode(self, state):
+        """Index of one state tuple (or feature value, for a single-feature spec)"""
+        if self.index_of is not None:
+            return self.index_of[state]
+        values = (state,) if len(self.names) == 1 else state
+        return sum(int(stride) * table[value] for stride, table, value in zip(self.strides, self.digits, values))
+
+    def decode(self, index):
+        """State tuple of an index"""
+        if self.states is not None:
+            return self.states[index]
+        return self.decode_digits(self.decode_batch(np.array([index]))[0])
+
+    def digits_of(self, codes):
+        """(N, n_features) digits of an (N, n_features) integer array of feature codes"""
+        codes = np.asarray(codes, dtype=np.int64).reshape(-1, len(self.names))
+        digits = np.empty_like(codes)
+        for i, table in enumerate(self.code_tables):
+            column = codes[:, i]
+            if np.any((column < 0) | (column >= len(table))):
+                raise ValueError(f"Unknown code of feature {self.names[i]}")
+            digits[:, i] = table[column]
+        if np.any(digits < 0):
+            raise ValueError("Code without a value")
+        return digits
+
+    def encode_batch(self, codes):
+        """Indices of an (N, n_features) integer array of feature codes (digits for features without a coding)"""
+        return self.digits_of(codes) @ self.strides
+
+    def decode_batch(self, indices):
+        """(N, n_features) digits of an array of indices"""
+        return (np.asarray(indices, dtype=np.int64)[:, None] // self.strides) % self.radices
+
+    def encode_states(self, states):
+        """Indices of a sequence of state tuples"""
+        return np.fromiter((self.encode(state) for state in states), dtype=np.int64, count=len(states))
+
+    def decode_states(self, indices):
+        """Object array (N, n_features) of the feature values of an array of indices"""
+        digits = self.decode_batch(indices)
+        return np.stack([values[digits[:, i]] for i, values in enumerate(self.values)], axis=1)
+
+    def describe(self):
+        for name, radix, stride in zip(self.names, self.radices, self.strides):
+            print(f"{name}: {radix} values, stride {stride}")
+        print(f"{self.size} states")
+
+
+def phase3_dangers():
+    """(forced, add1, add2) triples in the order of the danger codes of encode_state3"""
+    ones, twos, threes = [], [], []
+    for forced in SIDES:
+        others = [side for side in SIDES if side != forced]
+        ones.append((forced, "none", "none"))
+        twos.extend((forced, a, "none") for a in others)
+        threes.extend((forced, a, b) for a in others for b in others if a != b)
+    return ones + twos + threes
+
+
+def phase3_food_codes():
+    """(sign(dx) + 1) * 3 + sign(dy) + 1, from the head to the food -> food_state of get_state3"""
+    coding = {}
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            if dx == 0:
+                food_state = "UP" if dy < 0 else "DOWN"
+            elif dy == 0:
+                food_state = "LEFT" if dx < 0 else "RIGHT"
+            else:
+                food_state = ("LEFT" if dx < 0 else "RIGHT", "UP" if dy < 0 else "DOWN")
+            coding[(dx + 1) * 3 + dy + 1] = food_state
+    return coding
+
+
+def phase3_danger_codes():
+    """direction (0 up .. 3 right) * 16 + danger bits (top 1, bottom 2, left 4, right 8) -> danger of get_state3"""
+    coding = {}
+    for direction, forced in enumerate(["bottom", "top", "right", "left"]):  # Side behind the head
+        for bits in range(16):
+            # Same priority order as get_state3; a bit on the forced side is ignored
+            additional = [side for i, side in enumerate(SIDES) if bits >> i & 1 and side != forced][:2]
+            additional += ["none"] * (2 - len(additional))
+            coding[direction * 16 + bits] = (forced, additional[0], additional[1])
+    return coding
+
+
+def phase2_states():
+    """(border, food_state) pairs in the row order of qtable_phase2.txt (no food beyond the border)"""
+    beyond = {"top": "UP", "bottom": "DOWN", "left": "LEFT", "right": "RIGHT"}
+    states = [("none", food) for food in FOOD_STATES]
+    for border in SIDES:
+        states.extend((border, food) for food in FOOD_STATES
+                      if beyond[border] not in (food if isinstance(food, tuple) else (food,)))
+    return states
+
+
+EGOCENTRIC_FOOD = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+EGOCENTRIC_DANGERS = list(itertools.product((0, 1), repeat=3))
+
+PHASE3 = StateSpec([("food_state", FOOD_STATES, phase3_food_codes()),
+                    ("danger", phase3_dangers(), phase3_danger_codes())])
+PHASE2 = StateSpec([("border_food", phase2_states())])
+EGOCENTRIC = StateSpec([("food", EGOCENTRIC_FOOD, {(dx + 1) * 3 + dy + 1: (dx, dy) for dx, dy in EGOCENTRIC_FOOD}),
+                        ("danger", EGOCENTRIC_DANGERS,  # (left, straight, right) -> bits left 4, straight 2, right 1
+                         {left * 4 + straight * 2 + right: (left, straight, right)
+                          for left, straight, right in EGOCENTRIC_DANGERS})])
+
+
+if __name__ == "__main__":
+    import time
+    from egocentric import encode_state_egocentric
+    from phase_2.q_learning2 import QLearning as QLearning2
+    from phase_3.q_learning import QLearning as QLearning3
+
+    for name, spec, encode in (("PHASE3", PHASE3, QLearning3(n_states=320, n_actions=4).encode_state3),
+                               ("PHASE2", PHASE2, QLearning2.encode_state),
+                               ("EGOCENTRIC", EGOCENTRIC, encode_state_egocentric)):
+        print(name)
+        spec.describe()
+        same = all(spec.encode(spec.decode(i)) == i == encode(spec.decode(i)) for i in range(len(spec)))
+        print(f"Same indices as the hand-written encoder: {same}")
+        # Every combination of codes against the encoder applied to the values they stand for
+        if spec.codings[0] is not None:
+            food_codings, danger_codings = spec.codings
+            codes = np.array([(f, d) for f in food_codings for d in danger_codings])
+            values = [(food_codings[f], danger_codings[d]) for f, d in codes.tolist()]
+            same = np.array_equal(spec.encode_batch(codes), [encode(state) for state in values])
+            print(f"encode_batch of the {len(codes)} code pairs: same indices {same}")
+            codes = codes[np.random.default_rng(0).integers(0, len(codes), 1_000_000)]
+            states = [(food_codings[f], danger_codings[d]) for f, d in codes.tolist()]
+            begin = time.perf_counter()
+            spec.encode_batch(codes)
+            middle = time.perf_counter()
+            spec.encode_states(states)
+            end = time.perf_counter()
+            print(f"1M states: encode_batch {middle - begin:.3f}s, encode_states {end - middle:.3f}s")
+        print()
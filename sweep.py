@@ -0,0 +1,142 @@
+"""
+Snake Eater hyperparameter sweep
+Replaces the hand-run hyp1/ and hyp2/ files: every combination of a grid over alpha, gamma,
+epsilon, epsilon_decay and episodes is trained from scratch in a process pool (one trial per
+task, each with its own seed), all episodes are stored in one columnar results file (.npz),
+and the last-100-episode summary of "script hyperparams.R" is computed here.
+"""
+import glob
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from snake_env import SnakeGameEnv
+from q_learning import QLearning
+from training import run_episode
+
+N_STATES = 320
+N_ACTIONS = 4
+
+# Per-trial columns, repeated on every episode row
+PARAMS = ["alpha", "gamma", "epsilon_start", "epsilon_decay", "episodes", "seed"]
+# Per-episode columns
+COLUMNS = ["trial", "episode", "epsilon", "total_reward", "score", "length", "steps"] + PARAMS
+
+
+def make_grid(alpha=(0.1, 0.2, 0.3, 0.4), gamma=(0.7, 0.8, 0.9), epsilon=(1.0,), epsilon_decay=(0.995,),
+              episodes=(500,), seed=0):
+    """Cartesian product of the values; trial i gets seed + i"""
+    trials = []
+    for i, (a, g, e, d, n) in enumerate(itertools.product(alpha, gamma, epsilon, epsilon_decay, episodes)):
+        trials.append({"trial": i, "alpha": a, "gamma": g, "epsilon_start": e, "epsilon_decay": d,
+                       "episodes": n, "seed": seed + i})
+    return trials
+
+
+def run_trial(trial, max_steps=2000):
+    """Trains one configuration from an empty Q-table. Returns its columns"""
+    random.seed(trial["seed"])
+    np.random.seed(trial["seed"])
+    env = SnakeGameEnv(150, 150, growing_body=True, seed=trial["seed"], verbose=False)
+    ql = QLearning(n_states=N_STATES, n_actions=N_ACTIONS, alpha=trial["alpha"], gamma=trial["gamma"],
+                   epsilon=trial["epsilon_start"], epsilon_decay=trial["epsilon_decay"])
+    ql.q_table = np.zeros((N_STATES, N_ACTIONS))
+
+    n = trial["episodes"]
+    columns = {"trial": np.full(n, trial["trial"]), "episode": np.arange(1, n + 1),
+               "epsilon": np.zeros(n), "total_reward": np.zeros(n), "score": np.zeros(n),
+               "length": np.zeros(n, dtype=np.int32), "steps": np.zeros(n, dtype=np.int32)}
+    for episode in range(n):
+        score, total_reward, length, steps = run_episode(env, ql, training=True, max_steps=max_steps)
+        # Same values save_hyperparams writes after each episode
+        columns["epsilon"][episode] = ql.epsilon
+        columns["total_reward"][episode] = total_reward
+        columns["score"][episode] = score
+        columns["length"][episode] = length
+        columns["steps"][episode] = steps
+    for key in PARAMS:
+        columns[key] = np.full(n, trial[key])
+    return columns
+
+
+def concatenate(results):
+    """Merges the columns of several trials, ordered by trial and episode"""
+    results = sorted(results, key=lambda columns: columns["trial"][0])
+    return {key: np.concatenate([columns[key] for columns in results]) for key in COLUMNS}
+
+
+def run_sweep(trials, results_file="sweep_results.npz", processes=None, max_steps=2000):
+    """Runs every trial in a process pool and saves all episodes in results_file"""
+    results = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {pool.submit(run_trial, trial, max_steps): trial for trial in trials}
+        for future in as_completed(futures):
+            trial = futures[future]
+            results.append(future.result())
+            print(f"Trial {trial['trial']} done: alpha={trial['alpha']}, gamma={trial['gamma']}, "
+                  f"epsilon={trial['epsilon_start']}, decay={trial['epsilon_decay']}, episodes={trial['episodes']}")
+
+    columns = concatenate(results)
+    if results_file:
+        np.savez(results_file, **columns)
+    return columns
+
+
+def load_results(results_file="sweep_results.npz"):
+    with np.load(results_file) as data:
+        return {key: data[key] for key in data.files}
+
+
+def import_legacy(pattern="hyp*/hyperparams_*.txt"):
+    """
+    Converts the files written by QLearning.save_hyperparams (Episode Alpha Gamma Epsilon TotalReward)
+    into the same columns, one trial per file. Columns the old files do not have are NaN / -1.
+    """
+    results = []
+    for i, filename in enumerate(sorted(glob.glob(pattern))):
+        data = np.loadtxt(filename, skiprows=1, ndmin=2)
+        n = len(data)
+        nan = np.full(n, np.nan)
+        results.append({"trial": np.full(n, i), "episode": data[:, 0].astype(int), "epsilon": data[:, 3],
+                        "total_reward": data[:, 4], "score": nan, "length": np.full(n, -1),
+                        "steps": np.full(n, -1), "alpha": data[:, 1], "gamma": data[:, 2],
+                        "epsilon_start": nan, "epsilon_decay": nan, "episodes": np.full(n, n),
+                        "seed": np.full(n, -1)})
+    return concatenate(results)
+
+
+def summarize(columns, last=100):
+    """
+    For every trial, mean/max/min total reward over its last `last` episodes
+    (the AvgFinalReward, MaxReward and MinReward of the R script), best average first.
+    """
+    rows = []
+    for trial in np.unique(columns["trial"]):
+        mask = columns["trial"] == trial
+        final = columns["episode"][mask] > columns["episode"][mask].max() - last
+        rewards = columns["total_reward"][mask][final]
+        first = np.flatnonzero(mask)[0]
+        row = {key: columns[key][first] for key in PARAMS}
+        row.update({"trial": int(trial), "avg_final_reward": float(rewards.mean()),
+                    "max_reward": float(rewards.max()), "min_reward": float(rewards.min())})
+        rows.append(row)
+    rows.sort(key=lambda row: row["avg_final_reward"], reverse=True)
+    return rows
+
+
+def print_summary(rows):
+    print(f"{'trial':>5} {'alpha':>6} {'gamma':>6} {'eps':>6} {'decay':>7} {'episodes':>8} "
+          f"{'AvgFinal':>10} {'Max':>8} {'Min':>8}")
+    for row in rows:
+        print(f"{row['trial']:>5} {row['alpha']:>6.2f} {row['gamma']:>6.2f} {row['epsilon_start']:>6.2f} "
+              f"{row['epsilon_decay']:>7.4f} {row['episodes']:>8} {row['avg_final_reward']:>10.1f} "
+              f"{row['max_reward']:>8.0f} {row['min_reward']:>8.0f}")
+
+
+if __name__ == "__main__":
+    if os.path.exists("sweep_results.npz"):
+        columns = load_results("sweep_results.npz")
+    else:
+        columns = run_sweep(make_grid())
+    print_summary(summarize(columns))
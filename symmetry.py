@@ -0,0 +1,165 @@
+"""
+Snake Eater symmetry-canonicalized Q-learning
+The square board and the rules do not change under the 8 symmetries of the square (4 rotations
+and 4 reflections), but encode_state3 learns every rotated or mirrored situation separately.
+Here every phase 3 state is mapped to the representative of its orbit (the transformed state
+with the smallest index) together with the transform that takes it there; Q-values are stored
+once per orbit, over the actions of the canonical state, and actions are mapped back through
+the transform when choosing.
+"""
+import random
+import numpy as np
+from q_learning import QLearning
+from egocentric import all_states3, VECTORS
+
+SIDES = {"top": "UP", "bottom": "DOWN", "left": "LEFT", "right": "RIGHT"}
+SIDE_NAMES = {direction: side for side, direction in SIDES.items()}
+DANGER_ORDER = ["top", "bottom", "left", "right"]
+ACTIONS = ["UP", "DOWN", "LEFT", "RIGHT"]
+
+# The dihedral group of the square as 2 x 2 integer matrices acting on (x, y) vectors
+TRANSFORMS = [np.array(m) for m in ([[1, 0], [0, 1]], [[0, -1], [1, 0]], [[-1, 0], [0, -1]], [[0, 1], [-1, 0]],
+                                    [[-1, 0], [0, 1]], [[1, 0], [0, -1]], [[0, 1], [1, 0]], [[0, -1], [-1, 0]])]
+
+
+def transform_direction(g, direction):
+    x, y = TRANSFORMS[g] @ VECTORS[direction]
+    return next(d for d, v in VECTORS.items() if v == (x, y))
+
+
+def transform_state(g, state):
+    """Applies transform g to a phase 3 state (food_state, (forced, add1, add2))"""
+    food_state, danger = state
+    names = [food_state] if isinstance(food_state, str) else list(food_state)
+    x, y = TRANSFORMS[g] @ np.sum([VECTORS[name] for name in names], axis=0)
+    if x == 0:
+        new_food = "UP" if y < 0 else "DOWN"
+    elif y == 0:
+        new_food = "LEFT" if x < 0 else "RIGHT"
+    else:
+        new_food = ("LEFT" if x < 0 else "RIGHT", "UP" if y < 0 else "DOWN")
+
+    forced = SIDE_NAMES[transform_direction(g, SIDES[danger[0]])]
+    # get_state3 lists the additional dangers in a fixed priority order
+    additional = sorted((SIDE_NAMES[transform_direction(g, SIDES[d])] for d in danger[1:] if d != "none"),
+                        key=DANGER_ORDER.index)
+    additional += ["none"] * (2 - len(additional))
+    return new_food, (forced, additional[0], additional[1])
+
+
+def build_tables():
+    """
+    Precomputes, for every encoded phase 3 state:
+        orbit_of[s]      -> index of its orbit (0 .. n_orbits - 1)
+        transform_of[s]  -> transform taking s to the orbit representative
+    and for every transform the action maps to_canonical[g][a] and from_canonical[g][a].
+    Codes whose additional dangers are not in get_state3's priority order never occur in the game;
+    transform_state sorts them, so they simply join the orbit of the sorted state.
+    """
+    states = all_states3()
+    canonical = np.zeros(len(states), dtype=np.int64)
+    transform_of = np.zeros(len(states), dtype=np.int64)
+    for index, state in enumerate(states):
+        images = [QLearning.encode_state3(transform_state(g, state)) for g in range(len(TRANSFORMS))]
+        transform_of[index] = int(np.argmin(images))
+        canonical[index] = images[transform_of[index]]
+    representatives, orbit_of = np.unique(canonical, return_inverse=True)
+
+    to_canonical = np.array([[ACTIONS.index(transform_direction(g, a)) for a in ACTIONS]
+                             for g in range(len(TRANSFORMS))])
+    from_canonical = np.argsort(to_canonical, axis=1)
+    return orbit_of, transform_of, to_canonical, from_canonical, len(representatives)
+
+
+class SymmetricQLearning(QLearning):
+    """QLearning with one row of Q-values per symmetry orbit of the phase 3 states"""
+    def __init__(self, n_states=320, n_actions=4, alpha=0.2, gamma=0.8, epsilon=0.05, epsilon_min=0,
+                 epsilon_decay=1):
+        # The tables are needed by load_q_table, which QLearning.__init__ calls
+        self.orbit_of, self.transform_of, self.to_canonical, self.from_canonical, self.n_orbits = build_tables()
+        super().__init__(n_states, n_actions, alpha, gamma, epsilon, epsilon_min, epsilon_decay)
+
+    def choose_action(self, state, allowed_actions):
+        if np.random.uniform(0, 1) < self.epsilon:
+            action = random.choice(allowed_actions)  # Explore
+        else:
+            # Exploit: best action of the canonical state, mapped back to this orientation
+            canonical_action = np.argmax(self.q_table[self.orbit_of[state]])
+            action = self.from_canonical[self.transform_of[state], canonical_action]
+
+        self.epsilon = max(self.epsilon_min, self.epsilon_decay * self.epsilon)
+        return action
+
+    def update_q_value(self, enc_state, action, reward, enc_next_state):
+        orbit = self.orbit_of[enc_state]
+        canonical_action = self.to_canonical[self.transform_of[enc_state], action]
+        current_q = self.q_table[orbit][canonical_action]
+
+        # Terminal state if snake dies
+        if reward == -75:
+            new_q = (1 - self.alpha) * current_q + self.alpha * reward
+        # The best value of the next state does not depend on its orientation
+        else:
+            new_q = (1 - self.alpha) * current_q + self.alpha * (
+                reward + self.gamma * np.max(self.q_table[self.orbit_of[enc_next_state]]))
+        self.q_table[orbit][canonical_action] = new_q
+
+    def to_absolute_table(self):
+        """Expands the orbit table to the usual 320 x 4 format of qtable_phase3.txt"""
+        actions = self.to_canonical[self.transform_of]  # Canonical counterpart of every (state, action)
+        return self.q_table[self.orbit_of[:, None], actions]
+
+    def from_absolute_table(self, table):
+        """Orbit table of a 320 x 4 table, read through one state of every orbit (inverse of to_absolute_table)"""
+        _, states = np.unique(self.orbit_of, return_index=True)
+        q_table = np.zeros((self.n_orbits, table.shape[1]))
+        q_table[self.orbit_of[states][:, None], self.to_canonical[self.transform_of[states]]] = table[states]
+        return q_table
+
+    def save_q_table(self, filename="qtable.txt"):
+        np.savetxt(filename, self.to_absolute_table())
+
+    def load_q_table(self, filename="qtable.txt"):
+        try:
+            self.q_table = self.from_absolute_table(np.loadtxt(filename))
+        except IOError:
+            self.q_table = np.zeros((self.n_orbits, self.n_actions))
+
+
+def compare(target=None, max_episodes=3000, eval_every=100, eval_episodes=20, seeds=(0, 1, 2),
+            alpha=0.1, gamma=0.9, epsilon=0.05, max_steps=2000):
+    """
+    Episodes each learner needs until its greedy policy reaches the target mean score
+    (by default the mean score of the current phase 3 agent in phase_3/test_results.txt).
+    """
+    from snake_env import SnakeGameEnv
+    from training import run_episode, evaluate, target_mean_score
+
+    if target is None:
+        target = target_mean_score()
+    results = {"plain": [], "symmetric": []}
+    for seed in seeds:
+        for name, cls in (("plain", QLearning), ("symmetric", SymmetricQLearning)):
+            random.seed(seed)
+            np.random.seed(seed)
+            env = SnakeGameEnv(150, 150, growing_body=True, seed=seed, verbose=False)
+            ql = cls(n_states=320, n_actions=4, alpha=alpha, gamma=gamma, epsilon=epsilon)
+            if cls is QLearning:
+                ql.q_table = np.zeros((320, 4))
+            reached = None
+            for episode in range(1, max_episodes + 1):
+                run_episode(env, ql, training=True, max_steps=max_steps)
+                if episode % eval_every == 0 and evaluate(ql, eval_episodes, seed + 1000, max_steps) >= target:
+                    reached = episode
+                    break
+            results[name].append(reached)
+
+    n_orbits = build_tables()[-1]
+    print(f"320 states -> {n_orbits} orbits")
+    for name, reached in results.items():
+        print(f"{name}: episodes until the greedy mean score reaches {target:.1f}: {reached}")
+    return results
+
+
+if __name__ == "__main__":
+    compare()
@@ -0,0 +1,136 @@
+"""
+Snake Eater terminal renderer
+Draws the board with ANSI escape codes for machines without a display.
+Only the cells that changed since the last frame are redrawn, and frames are throttled
+to a refresh rate that does not depend on how fast the environment is stepped.
+"""
+import sys
+import time
+
+CELL = 10  # Size of a block in the game, in pixels
+
+# ANSI escape codes
+CLEAR = "\x1b[2J"
+HIDE_CURSOR = "\x1b[?25l"
+SHOW_CURSOR = "\x1b[?25h"
+RESET = "\x1b[0m"
+EMPTY = "  "
+SNAKE = "\x1b[42m  " + RESET
+HEAD = "\x1b[102m  " + RESET
+FOOD = "\x1b[41m  " + RESET
+
+
+def move_to(row, col):
+    """Escape code to move the cursor to a board cell (1-based terminal rows/columns, two columns per cell)"""
+    return f"\x1b[{row + 2};{2 * col + 2}H"
+
+
+class TerminalRenderer:
+    def __init__(self, frame_size_x=150, frame_size_y=150, refresh_rate=10, stream=None):
+        self.cols = frame_size_x // CELL
+        self.rows = frame_size_y // CELL
+        self.refresh_rate = refresh_rate
+        self.stream = stream if stream is not None else sys.stdout
+        self.cells = {}       # (row, col) -> drawn string, for the cells that are not empty
+        self.last_draw = 0.0
+        self.needs_clear = True
+
+    def invalidate(self):
+        """Forces a full redraw on the next frame (e.g. after something else printed on the terminal)"""
+        self.needs_clear = True
+
+    def _draw_border(self):
+        out = [CLEAR, HIDE_CURSOR, "\x1b[1;1H", "+" + "--" * self.cols + "+"]
+        for row in range(self.rows):
+            out.append(f"\x1b[{row + 2};1H|" + EMPTY * self.cols + "|")
+        out.append(f"\x1b[{self.rows + 2};1H+" + "--" * self.cols + "+")
+        return out
+
+    def draw(self, snake_body, food_pos, status=""):
+        """Redraws the cells that differ from the previous frame"""
+        cells = {}
+        for i, (x, y) in enumerate(snake_body):
+            row, col = y // CELL, x // CELL
+            if 0 <= row < self.rows and 0 <= col < self.cols:
+                cells[(row, col)] = HEAD if i == 0 else SNAKE
+        cells[(food_pos[1] // CELL, food_pos[0] // CELL)] = FOOD
+
+        out = []
+        if self.needs_clear:
+            out.extend(self._draw_border())
+            self.cells = {}
+            self.needs_clear = False
+
+        # Cells that are no longer occupied (usually the old tail) and cells that changed (head, food)
+        for cell in self.cells.keys() - cells.keys():
+            out.append(move_to(*cell) + EMPTY)
+        for cell, drawn in cells.items():
+            if self.cells.get(cell) != drawn:
+                out.append(move_to(*cell) + drawn)
+        self.cells = cells
+
+        out.append(f"\x1b[{self.rows + 3};1H\x1b[2K{status}")
+        self.stream.write("".join(out))
+        self.stream.flush()
+        self.last_draw = time.monotonic()
+
+    def update(self, snake_body, food_pos, status=""):
+        """Draws a frame only if 1 / refresh_rate seconds have passed since the previous one"""
+        if time.monotonic() - self.last_draw < 1.0 / self.refresh_rate:
+            return False
+        self.draw(snake_body, food_pos, status)
+        return True
+
+    def close(self):
+        self.stream.write(f"\x1b[{self.rows + 4};1H" + SHOW_CURSOR)
+        self.stream.flush()
+
+
+def attach(env, refresh_rate=10, stream=None):
+    """
+    Watches an environment that is being stepped by any training loop: wraps env.step and env.reset
+    so the board is drawn after them (throttled to refresh_rate). Returns the renderer.
+    """
+    renderer = TerminalRenderer(env.frame_size_x, env.frame_size_y, refresh_rate, stream)
+    step, reset = env.step, env.reset
+    episode = [0, 0]  # episode number, steps in the episode
+
+    def watched_step(action):
+        result = step(action)
+        episode[1] += 1
+        renderer.update(env.get_body(), env.get_food(),
+                        f"Episode {episode[0]}  Step {episode[1]}  Length {len(env.get_body())}")
+        return result
+
+    def watched_reset():
+        result = reset()
+        episode[0] += 1
+        episode[1] = 0
+        # reset() prints on the terminal, so the board has to be drawn again from scratch
+        renderer.invalidate()
+        return result
+
+    env.step = watched_step
+    env.reset = watched_reset
+    return renderer
+
+
+if __name__ == "__main__":
+    from snake_env import SnakeGameEnv
+    from q_learning import QLearning
+
+    env = SnakeGameEnv(150, 150, growing_body=True)
+    ql = QLearning(n_states=320, n_actions=4, epsilon=0)
+    ql.load_q_table("qtable_phase3.txt")
+    renderer = attach(env, refresh_rate=15)
+
+    try:
+        for episode in range(5):
+            state = env.reset()
+            game_over = False
+            while not game_over:
+                action = ql.choose_action(ql.encode_state3(state), [0, 1, 2, 3])
+                state, reward, game_over = env.step(action)
+                time.sleep(0.02)
+    finally:
+        renderer.close()
@@ -0,0 +1,110 @@
+"""
+Snake Eater multi-step Q-learning
+One-step updates move the +100 of an apple back along the approach path one state per visit.
+These variants propagate it further on every step:
+    - NStepQLearning: n-step returns r_t + ... + gamma^(n-1) r_(t+n-1) + gamma^n max Q(s_(t+n))
+    - WatkinsQLambda: Q(lambda) with replacing eligibility traces
+Both only keep the recently visited (state, action) pairs in a small bounded structure (a deque
+of at most n transitions, or an ordered dict of at most max_traces traces), never a dense trace
+matrix, and both cut the backup at exploratory (non-greedy) actions, as Watkins' Q(lambda) does.
+"""
+from collections import OrderedDict, deque
+import numpy as np
+from q_learning import QLearning
+
+
+def is_greedy(q_row, action):
+    return q_row[action] == np.max(q_row)
+
+
+class NStepQLearning(QLearning):
+    def __init__(self, n_states, n_actions, alpha=0.2, gamma=0.8, epsilon=0.05, epsilon_min=0, epsilon_decay=1,
+                 n_step=4):
+        super().__init__(n_states, n_actions, alpha, gamma, epsilon, epsilon_min, epsilon_decay)
+        self.n_step = n_step
+        self.buffer = deque()  # (state, action, reward) of the last transitions not updated yet
+        self.last_next_state = None
+
+    def _update_oldest(self, bootstrap):
+        """Updates the oldest buffered transition with the return of the whole buffer plus bootstrap"""
+        ret = bootstrap
+        for _, _, reward in reversed(self.buffer):
+            ret = reward + self.gamma * ret
+        state, action, _ = self.buffer.popleft()
+        self.q_table[state][action] += self.alpha * (ret - self.q_table[state][action])
+        self.refresh_policy(state)
+
+    def _flush(self, bootstrap_state):
+        """Updates every buffered transition, bootstrapping from bootstrap_state (None when terminal)"""
+        while self.buffer:
+            bootstrap = 0.0 if bootstrap_state is None else np.max(self.q_table[bootstrap_state])
+            self._update_oldest(bootstrap)
+
+    def update_q_value(self, enc_state, action, reward, enc_next_state):
+        # An exploratory action ends the returns of the previous transitions at this state
+        if self.buffer and not is_greedy(self.q_table[enc_state], action):
+            self._flush(enc_state)
+
+        self.buffer.append((enc_state, action, reward))
+        self.last_next_state = enc_next_state
+
+        # Terminal state if snake dies
+        if reward == -75:
+            self._flush(None)
+        elif len(self.buffer) == self.n_step:
+            self._update_oldest(np.max(self.q_table[enc_next_state]))
+
+    def end_episode(self):
+        """Episode cut without dying (step limit): bootstrap the remaining transitions"""
+        if self.buffer:
+            self._flush(self.last_next_state)
+
+
+class WatkinsQLambda(QLearning):
+    def __init__(self, n_states, n_actions, alpha=0.2, gamma=0.8, epsilon=0.05, epsilon_min=0, epsilon_decay=1,
+                 lam=0.8, max_traces=64, min_trace=1e-3):
+        super().__init__(n_states, n_actions, alpha, gamma, epsilon, epsilon_min, epsilon_decay)
+        self.lam = lam
+        self.max_traces = max_traces
+        self.min_trace = min_trace
+        self.traces = OrderedDict()  # (state, action) -> eligibility, oldest first
+
+    def update_q_value(self, enc_state, action, reward, enc_next_state):
+        # Watkins: the traces only follow the greedy policy, an exploratory action cuts them
+        if not is_greedy(self.q_table[enc_state], action):
+            self.traces.clear()
+
+        # Terminal state if snake dies
+        if reward == -75:
+            delta = reward - self.q_table[enc_state][action]
+        else:
+            delta = reward + self.gamma * np.max(self.q_table[enc_next_state]) - self.q_table[enc_state][action]
+
+        # Replacing trace for the current pair, moved to the newest position
+        self.traces.pop((enc_state, action), None)
+        self.traces[(enc_state, action)] = 1.0
+        if len(self.traces) > self.max_traces:
+            self.traces.popitem(last=False)
+
+        decay = self.gamma * self.lam
+        faded = []
+        for (state, a), trace in self.traces.items():
+            self.q_table[state][a] += self.alpha * delta * trace
+            self.refresh_policy(state)
+            trace *= decay
+            if trace < self.min_trace:
+                faded.append((state, a))
+            else:
+                self.traces[(state, a)] = trace
+        for key in faded:
+            del self.traces[key]
+
+        if reward == -75:
+            self.traces.clear()
+
+    def end_episode(self):
+        self.traces.clear()
+
+
+# Algorithms selectable from SnakeGame.main
+AGENTS = {"q": QLearning, "nstep": NStepQLearning, "qlambda": WatkinsQLambda}
@@ -0,0 +1,80 @@
+"""
+Snake Eater headless training loop
+Same episode loop as SnakeGame.main without the window and the per-step prints,
+shared by the parallel trainers and the experiments.
+"""
+import random
+import numpy as np
+from snake_env import SnakeGameEnv
+from q_learning import QLearning
+
+
+def run_episode(env, ql, training=True, max_steps=None):
+    """
+    Plays one episode with the agent ql, updating its Q-table if training.
+    Returns (score, total_reward, snake length, steps); score follows SnakeGame.main
+    (+100 per apple, -1 for every other step).
+    """
+    state = env.reset()
+    total_reward = 0
+    score = 0
+    steps = 0
+    game_over = False
+    while not game_over:
+        action = ql.choose_action(ql.encode_state3(state), [0, 1, 2, 3])
+        next_state, reward, game_over = env.step(action)
+        if reward == 100: # Apple is eaten
+            score += 100
+        else:
+            score -= 1
+
+        if training:
+            ql.update_q_table(state, action, reward, next_state)
+
+        state = next_state
+        total_reward += reward
+        steps += 1
+        if max_steps and steps >= max_steps:
+            break
+
+    if training:
+        ql.end_episode()
+    return score, total_reward, len(env.get_body()), steps
+
+
+def evaluate(ql, n_episodes=20, seed=None, max_steps=2000):
+    """Mean score of the greedy policy (epsilon = 0, no updates) over n_episodes games"""
+    env = SnakeGameEnv(150, 150, growing_body=True, seed=seed, verbose=False)
+    epsilon = ql.epsilon
+    ql.epsilon = 0
+    scores = [run_episode(env, ql, training=False, max_steps=max_steps)[0] for _ in range(n_episodes)]
+    ql.epsilon = epsilon
+    return float(np.mean(scores))
+
+
+def target_mean_score(filename="phase_3/test_results.txt"):
+    """Mean score of the evaluation runs of the phase 3 agent (first column of test_results.txt)"""
+    return float(np.loadtxt(filename)[:, 0].mean())
+
+
+def episodes_to_target(scores, target, window=50):
+    """First episode at which the mean score of the last `window` episodes reaches the target"""
+    means = np.convolve(scores, np.ones(window) / window, mode="valid")
+    reached = np.flatnonzero(means >= target)
+    return int(reached[0]) + window if len(reached) else None
+
+
+def steps_to_target(ql, target, max_episodes=3000, eval_every=50, eval_episodes=20, seed=0, max_steps=2000):
+    """Environment steps of training until the greedy policy of ql reaches the target mean score"""
+    random.seed(seed)
+    np.random.seed(seed)
+    env = SnakeGameEnv(150, 150, growing_body=True, seed=seed, verbose=False)
+    # Evaluation uses the plain greedy policy of the same table (no exploration bonus)
+    greedy = QLearning(n_states=ql.n_states, n_actions=ql.n_actions, epsilon=0)
+    greedy.q_table = ql.q_table
+    total_steps = 0
+    for episode in range(1, max_episodes + 1):
+        total_steps += run_episode(env, ql, training=True, max_steps=max_steps)[3]
+        if episode % eval_every == 0 and evaluate(greedy, eval_episodes, seed + 1000, max_steps) >= target:
+            return total_steps
+    return None
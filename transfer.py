@@ -0,0 +1,104 @@
+"""
+Snake Eater transfer from the phase 2 table
+Phase 2 learned a 28-row table over (border, food_state), phase 3 starts its 320 x 4 table
+from zeros. This module projects every phase 3 state onto the phase 2 features it corresponds
+to and copies the phase 2 Q-values, so phase 3 training starts from the old policy.
+
+A phase 3 state (food_state, (forced, add1, add2)) has the same food_state as phase 2. Its
+additional dangers play the role of the border: each one whose side still admits the food
+state in phase 2 (the food cannot be beyond a wall) is a candidate border, and the state takes
+the mean of their rows. Without such a danger the "none" row is used. The forced danger
+(reversing) was not part of phase 2.
+
+The projection is a (new states x old states) matrix, so any newer encoding can be initialized
+from an older table the same way with project_table.
+
+Copied as they are, the phase 2 values (up to ~120) are large enough to hold the old policy,
+which runs into the body it could not see, and training takes longer than from zeros. The
+warm start therefore scales them down to a preference between actions and sets the moves into
+a known phase 3 danger to the death reward.
+"""
+import numpy as np
+from q_learning import QLearning
+from egocentric import all_states3
+from training import steps_to_target, target_mean_score
+from phase_2.q_learning2 import QLearning as QLearning2
+
+PHASE2_STATES = 28
+DANGER_ACTIONS = {"top": 0, "bottom": 1, "left": 2, "right": 3}
+
+
+def phase2_candidates(state):
+    """Phase 2 (border, food_state) states matching a phase 3 state"""
+    food_state, danger = state
+    candidates = []
+    for border in danger[1:]:
+        if border == "none":
+            continue
+        try:
+            QLearning2.encode_state((border, food_state))  # Raises if the food is beyond that border
+        except KeyError:
+            continue
+        candidates.append((border, food_state))
+    return candidates or [("none", food_state)]
+
+
+def projection_matrix():
+    """(320, 28) matrix whose row s holds the weights of the phase 2 rows averaged for phase 3 state s"""
+    projection = np.zeros((len(all_states3()), PHASE2_STATES))
+    for index, state in enumerate(all_states3()):
+        candidates = phase2_candidates(state)
+        for candidate in candidates:
+            projection[index, QLearning2.encode_state(candidate)] += 1 / len(candidates)
+    return projection
+
+
+def danger_mask():
+    """(320, 4) boolean mask of the actions moving into an additional danger of each phase 3 state"""
+    mask = np.zeros((len(all_states3()), len(DANGER_ACTIONS)), dtype=bool)
+    for index, (_, danger) in enumerate(all_states3()):
+        for side in danger[1:]:
+            if side != "none":
+                mask[index, DANGER_ACTIONS[side]] = True
+    return mask
+
+
+def project_table(old_table, projection):
+    """Initial table of the new encoding: every new state gets the weighted old Q-values"""
+    return projection @ old_table
+
+
+def warm_start(phase2_file="phase_2/qtable_phase2.txt", scale=0.02, danger_value=-75.0, filename=None):
+    """
+    Phase 3 table initialized from the phase 2 table, saved to filename if given.
+    scale multiplies the projected phase 2 values; danger_value (None to keep the projection)
+    is given to the moves into a danger.
+    """
+    q_table = scale * project_table(np.loadtxt(phase2_file), projection_matrix())
+    if danger_value is not None:
+        q_table[danger_mask()] = danger_value
+    if filename:
+        np.savetxt(filename, q_table)
+    return q_table
+
+
+def compare(target=None, seeds=(0, 1, 2), alpha=0.1, gamma=0.9, epsilon=0.05, **kwargs):
+    """Environment steps until the greedy policy reaches the target, from zeros and from the phase 2 table"""
+    if target is None:
+        target = target_mean_score()
+    initial = {"from zeros": np.zeros((320, 4)),
+               "phase 2 copied": warm_start(scale=1, danger_value=None),
+               "phase 2 warm start": warm_start()}
+    results = {}
+    for name, q_table in initial.items():
+        results[name] = []
+        for seed in seeds:
+            ql = QLearning(n_states=320, n_actions=4, alpha=alpha, gamma=gamma, epsilon=epsilon)
+            ql.q_table = q_table.copy()
+            results[name].append(steps_to_target(ql, target, seed=seed, **kwargs))
+        print(f"{name}: environment steps to a greedy mean score of {target:.1f}: {results[name]}")
+    return results
+
+
+if __name__ == "__main__":
+    compare()
@@ -0,0 +1,110 @@
+"""
+Snake Eater value iteration on the estimated phase 3 MDP
+The phase 3 encoding only has 320 states x 4 actions, so instead of learning Q-values one
+step at a time we can estimate the abstract MDP from rollouts and solve it exactly:
+    - worker processes play epsilon-greedy games and count, for every (s, a), the next
+      encoded states s' (when the snake survives) and the sum of the rewards
+    - the counts become a sparse (320 * 4) x 320 transition matrix P and a reward vector R
+    - value iteration Q = R + gamma * P @ max_a Q runs on the whole table at once
+Dying ends the game, so its probability simply carries no future value. The result is saved
+in the format of qtable_phase3.txt.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy import sparse
+from q_learning import QLearning
+from offline import log_episodes
+from training import evaluate
+
+N_STATES = 320
+N_ACTIONS = 4
+
+
+def rollout_counts(table_file, n_episodes, epsilon, seed, max_steps=2000):
+    """Counts of one worker: (next state counts (S * A, S), reward sums (S * A), visits (S * A))"""
+    states, actions, rewards, next_states, dones = log_episodes(table_file, n_episodes, epsilon, seed, max_steps)
+    pairs = states.astype(np.int64) * N_ACTIONS + actions
+    alive = dones == 0
+    next_counts = np.bincount(pairs[alive] * N_STATES + next_states[alive], minlength=N_STATES * N_ACTIONS * N_STATES)
+    return (next_counts.reshape(N_STATES * N_ACTIONS, N_STATES),
+            np.bincount(pairs, weights=rewards, minlength=N_STATES * N_ACTIONS),
+            np.bincount(pairs, minlength=N_STATES * N_ACTIONS))
+
+
+def estimate_mdp(table_file="qtable_phase3.txt", n_episodes=2000, epsilon=0.1, seed=0, n_workers=None,
+                 max_steps=2000):
+    """
+    Estimates the MDP from n_episodes games split over worker processes.
+    Returns (P as a sparse CSR matrix of shape (S * A, S), R (S * A), visits (S * A)).
+    """
+    n_workers = n_workers or os.cpu_count()
+    shares = [n_episodes // n_workers + (i < n_episodes % n_workers) for i in range(n_workers)]
+    next_counts = np.zeros((N_STATES * N_ACTIONS, N_STATES), dtype=np.int64)
+    reward_sums = np.zeros(N_STATES * N_ACTIONS)
+    visits = np.zeros(N_STATES * N_ACTIONS, dtype=np.int64)
+    with ProcessPoolExecutor(n_workers) as pool:
+        futures = [pool.submit(rollout_counts, table_file, share, epsilon, seed * 1000 + i, max_steps)
+                   for i, share in enumerate(shares) if share]
+        for future in futures:
+            worker_counts, worker_rewards, worker_visits = future.result()
+            next_counts += worker_counts
+            reward_sums += worker_rewards
+            visits += worker_visits
+
+    # Deaths have no next state, so the rows of P sum to the probability of surviving the step
+    seen = np.maximum(visits, 1)
+    transitions = sparse.csr_matrix(sparse.diags(1.0 / seen) @ sparse.csr_matrix(next_counts))
+    return transitions, reward_sums / seen, visits
+
+
+def value_iteration(transitions, rewards, visits, gamma=0.9, tol=1e-6, max_iterations=10000, unseen_value=-75.0):
+    """
+    Solves Q = R + gamma * P @ max_a Q. Pairs never tried in the rollouts are given unseen_value
+    (by default the death penalty) so that the greedy policy avoids them.
+    Returns (Q-table of shape (S, A), iterations, last maximum change).
+    """
+    unseen = visits == 0
+    q = np.zeros(N_STATES * N_ACTIONS)
+    change = np.inf
+    for iteration in range(1, max_iterations + 1):
+        values = np.max(q.reshape(N_STATES, N_ACTIONS), axis=1)
+        new_q = rewards + gamma * (transitions @ values)
+        new_q[unseen] = unseen_value
+        change = np.max(np.abs(new_q - q))
+        q = new_q
+        if change < tol:
+            break
+    return q.reshape(N_STATES, N_ACTIONS), iteration, change
+
+
+def compare(table_file="qtable_phase3.txt", n_episodes=2000, epsilon=0.1, gamma=0.9, eval_episodes=100,
+            output="qtable_vi.txt"):
+    """Solves the estimated MDP and compares its greedy policy with the learned table"""
+    start = time.perf_counter()
+    transitions, rewards, visits = estimate_mdp(table_file, n_episodes, epsilon)
+    rollout_time = time.perf_counter() - start
+    print(f"Rollouts: {n_episodes} games, {visits.sum()} transitions, "
+          f"{np.count_nonzero(visits)} of {N_STATES * N_ACTIONS} pairs seen, "
+          f"{transitions.nnz} non-zero transitions, {rollout_time:.1f} s")
+
+    start = time.perf_counter()
+    q_table, iterations, change = value_iteration(transitions, rewards, visits, gamma)
+    print(f"Value iteration: {iterations} iterations in {time.perf_counter() - start:.3f} s "
+          f"(last change {change:.1e})")
+    np.savetxt(output, q_table)
+
+    learned = np.loadtxt(table_file)
+    visited_states = np.flatnonzero(visits.reshape(N_STATES, N_ACTIONS).sum(axis=1))
+    agreement = np.mean(np.argmax(q_table[visited_states], axis=1) == np.argmax(learned[visited_states], axis=1))
+    print(f"Same greedy action as {table_file} in {agreement:.1%} of the visited states")
+    for name, table in ((table_file, learned), (output, q_table)):
+        ql = QLearning(n_states=N_STATES, n_actions=N_ACTIONS, epsilon=0)
+        ql.q_table = table
+        print(f"{name}: greedy mean score {evaluate(ql, eval_episodes, seed=12345):.1f}")
+    return q_table
+
+
+if __name__ == "__main__":
+    compare()
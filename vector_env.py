@@ -0,0 +1,199 @@
+"""
+Snake Eater vector environment
+Runs many SnakeGameEnv games split across worker processes. Actions, encoded states, rewards
+and dones live in shared memory, and each step only costs one semaphore release/acquire per
+worker, so nothing is pickled after start-up. Finished games are reset automatically.
+"""
+import multiprocessing as mp
+import time
+import numpy as np
+from snake_env import SnakeGameEnv
+from q_learning import QLearning
+from shared_arrays import SharedArrays
+
+# Commands written by the main process in the shared "command" array
+STEP, RESET, CLOSE = 0, 1, 2
+
+
+def vector_layout(n_games):
+    return {
+        "command": (np.int32, (1,)),
+        "actions": (np.int8, (n_games,)),
+        "states": (np.int16, (n_games,)),            # encode_state3 of the current state (after auto-reset)
+        "rewards": (np.float32, (n_games,)),
+        "dones": (np.uint8, (n_games,)),
+        "truncated": (np.uint8, (n_games,)),        # Done because of max_episode_steps, not a death
+        "final_states": (np.int16, (n_games,)),     # encode_state3 of the last state before the auto-reset
+        # Filled for the games that finished in the last step (dones == 1)
+        "episode_rewards": (np.float32, (n_games,)),
+        "episode_steps": (np.int32, (n_games,)),
+        "episode_lengths": (np.int32, (n_games,)),  # Snake length at the end of the episode
+    }
+
+
+def worker(shm_name, n_games, lanes, seed, frame_size, growing_body, max_episode_steps,
+           watch_lane, start, finished):
+    """Simulates the games lanes[0]..lanes[1]-1 until the CLOSE command"""
+    shared = SharedArrays(vector_layout(n_games), shm_name)
+    command, actions, states = shared["command"], shared["actions"], shared["states"]
+    rewards, dones = shared["rewards"], shared["dones"]
+    truncated, final_states = shared["truncated"], shared["final_states"]
+    episode_rewards, episode_steps, episode_lengths = (shared["episode_rewards"], shared["episode_steps"],
+                                                       shared["episode_lengths"])
+
+    first, last = lanes
+    envs = [SnakeGameEnv(frame_size[0], frame_size[1], growing_body,
+                         seed=None if seed is None else seed + lane, verbose=False)
+            for lane in range(first, last)]
+    if watch_lane is not None and first <= watch_lane < last:
+        from terminal_render import attach
+        attach(envs[watch_lane - first])
+    total_rewards = np.zeros(last - first)
+    steps = np.zeros(last - first, dtype=np.int64)
+
+    while True:
+        start.acquire()
+        if command[0] == CLOSE:
+            break
+
+        if command[0] == RESET:
+            for i, env in enumerate(envs):
+                states[first + i] = QLearning.encode_state3(env.reset())
+            total_rewards[:] = 0
+            steps[:] = 0
+            dones[first:last] = 0
+            truncated[first:last] = 0
+        else:
+            for i, env in enumerate(envs):
+                lane = first + i
+                state, reward, game_over = env.step(int(actions[lane]))
+                total_rewards[i] += reward
+                steps[i] += 1
+                truncated[lane] = not game_over and bool(max_episode_steps) and steps[i] >= max_episode_steps
+                if game_over or truncated[lane]:
+                    final_states[lane] = QLearning.encode_state3(state)
+                    episode_rewards[lane] = total_rewards[i]
+                    episode_steps[lane] = steps[i]
+                    episode_lengths[lane] = len(env.get_body())
+                    total_rewards[i] = 0
+                    steps[i] = 0
+                    state = env.reset()
+                    game_over = True
+                states[lane] = QLearning.encode_state3(state)
+                rewards[lane] = reward
+                dones[lane] = game_over
+        finished.release()
+
+    del command, actions, states, rewards, dones, truncated, final_states, episode_rewards, episode_steps, episode_lengths
+    shared.close()
+
+
+class SubprocVectorEnv:
+    """
+    n_games independent games simulated by n_workers processes (one contiguous slice each).
+    The arrays returned by reset/step are views of shared memory that are overwritten on the next call.
+    """
+    def __init__(self, n_games, n_workers=None, seed=None, frame_size_x=150, frame_size_y=150,
+                 growing_body=True, max_episode_steps=None, watch_lane=None):
+        self.n_games = n_games
+        self.n_workers = min(n_workers or mp.cpu_count(), n_games)
+        self.shared = SharedArrays(vector_layout(n_games))
+        self.command = self.shared["command"]
+        self.actions = self.shared["actions"]
+        self.states = self.shared["states"]
+        self.rewards = self.shared["rewards"]
+        self.dones = self.shared["dones"]
+        self.truncated = self.shared["truncated"]
+        self.final_states = self.shared["final_states"]
+        self.episode_rewards = self.shared["episode_rewards"]
+        self.episode_steps = self.shared["episode_steps"]
+        self.episode_lengths = self.shared["episode_lengths"]
+
+        bounds = np.linspace(0, n_games, self.n_workers + 1).astype(int)
+        self.start = [mp.Semaphore(0) for _ in range(self.n_workers)]
+        self.finished = [mp.Semaphore(0) for _ in range(self.n_workers)]
+        self.processes = []
+        for w in range(self.n_workers):
+            p = mp.Process(target=worker, daemon=True,
+                           args=(self.shared.name, n_games, (bounds[w], bounds[w + 1]), seed,
+                                 (frame_size_x, frame_size_y), growing_body, max_episode_steps,
+                                 watch_lane, self.start[w], self.finished[w]))
+            p.start()
+            self.processes.append(p)
+        self.closed = False
+
+    def _run(self, command, poll=1.0):
+        """Runs a command on every worker; raises RuntimeError if a worker died instead of waiting forever"""
+        self.command[0] = command
+        for sem in self.start:
+            sem.release()
+        for sem, p in zip(self.finished, self.processes):
+            while not sem.acquire(timeout=poll):
+                if not p.is_alive():
+                    raise RuntimeError(f"Vector env worker {p.name} exited with code {p.exitcode}")
+
+    def reset(self):
+        """Resets every game and returns their encoded states"""
+        self._run(RESET)
+        return self.states
+
+    def step(self, actions=None):
+        """
+        Applies one action per game. The actions can also be written directly in self.actions
+        (and step called without arguments) to avoid the copy.
+        Returns (states, rewards, dones); finished games are already reset in states. For them,
+        self.final_states holds the last state of the episode and self.truncated tells whether it
+        ended at max_episode_steps rather than with a death.
+        """
+        if actions is not None:
+            self.actions[:] = actions
+        self._run(STEP)
+        return self.states, self.rewards, self.dones
+
+    def close(self):
+        if self.closed:
+            return
+        self.command[0] = CLOSE
+        for sem in self.start:
+            sem.release()
+        for p in self.processes:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+        self.command = self.actions = self.states = self.rewards = self.dones = None
+        self.truncated = self.final_states = None
+        self.episode_rewards = self.episode_steps = self.episode_lengths = None
+        self.shared.close()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        if not getattr(self, "closed", True):
+            self.close()
+
+
+def benchmark(n_games=64, steps=2000, worker_counts=None):
+    """Measures steps per second (summed over all games) with random actions for several worker counts"""
+    worker_counts = worker_counts or sorted({1, 2, 4, mp.cpu_count()})
+    rng = np.random.default_rng(0)
+    results = {}
+    for n_workers in worker_counts:
+        with SubprocVectorEnv(n_games, n_workers, seed=0) as venv:
+            venv.reset()
+            begin = time.perf_counter()
+            for _ in range(steps):
+                venv.actions[:] = rng.integers(0, 4, n_games)
+                venv.step()
+            elapsed = time.perf_counter() - begin
+        results[n_workers] = n_games * steps / elapsed
+        print(f"{n_workers} workers: {results[n_workers]:.0f} steps/s")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark()